@@ -0,0 +1,77 @@
+"""
+Score-adaptive top_k for retrieval.
+
+Instead of always sending a fixed number of chunks, over-fetch candidates in
+one query and keep the longest prefix of them (best first) that passes every
+cutoff:
+
+    score floor      similarity below min_score is noise, not context
+    relative drop    stop once a score falls more than max_relative_drop
+                     below the best candidate's
+    token cap        stop before the retrieved text exceeds max_context_tokens
+
+Strong multi-chunk answers keep several chunks; weak matches shrink to
+min_k, so low-relevance questions send smaller prompts.
+
+Configure with ADAPTIVE_TOP_K ("off" disables), ADAPTIVE_MIN_SCORE,
+ADAPTIVE_MAX_DROP and ADAPTIVE_MAX_TOKENS.
+"""
+import os
+
+import numpy as np
+
+# Candidates fetched per query, and the most that are ever kept
+DEFAULT_CANDIDATES = 10
+DEFAULT_MAX_K = 6
+DEFAULT_MIN_K = 1
+
+# Cosine similarities for text-embedding-3-small; unrelated text rarely scores above ~0.25
+DEFAULT_MIN_SCORE = 0.3
+DEFAULT_MAX_RELATIVE_DROP = 0.15
+DEFAULT_MAX_CONTEXT_TOKENS = 1200
+
+
+class AdaptiveTopK:
+    def __init__(
+        self,
+        candidates=DEFAULT_CANDIDATES,
+        min_k=DEFAULT_MIN_K,
+        max_k=DEFAULT_MAX_K,
+        min_score=DEFAULT_MIN_SCORE,
+        max_relative_drop=DEFAULT_MAX_RELATIVE_DROP,
+        max_context_tokens=DEFAULT_MAX_CONTEXT_TOKENS
+    ):
+        if not 0 <= min_k <= max_k <= candidates:
+            raise ValueError("Expected 0 <= min_k <= max_k <= candidates")
+        self.candidates = candidates
+        self.min_k = min_k
+        self.max_k = max_k
+        self.min_score = min_score
+        self.max_relative_drop = max_relative_drop
+        self.max_context_tokens = max_context_tokens
+
+    @classmethod
+    def from_env(cls):
+        """Settings from ADAPTIVE_* environment variables, or None when ADAPTIVE_TOP_K=off"""
+        if os.getenv("ADAPTIVE_TOP_K", "on").strip().lower() in ("off", "0", "false", "no"):
+            return None
+        return cls(
+            min_score=float(os.getenv("ADAPTIVE_MIN_SCORE", DEFAULT_MIN_SCORE)),
+            max_relative_drop=float(os.getenv("ADAPTIVE_MAX_DROP", DEFAULT_MAX_RELATIVE_DROP)),
+            max_context_tokens=int(os.getenv("ADAPTIVE_MAX_TOKENS", DEFAULT_MAX_CONTEXT_TOKENS))
+        )
+
+    def select(self, scores, token_counts):
+        """
+        How many of the candidates (sorted by descending score) to keep.
+        All cutoffs are evaluated over the whole candidate array at once; the
+        first candidate that fails any of them ends the prefix.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        if len(scores) == 0:
+            return 0
+        passes = scores >= self.min_score
+        passes &= scores >= scores[0] - self.max_relative_drop * abs(scores[0])
+        passes &= np.cumsum(np.asarray(token_counts, dtype=np.int64)) <= self.max_context_tokens
+        kept = int(np.logical_and.accumulate(passes).sum())
+        return min(max(kept, min(self.min_k, len(scores))), self.max_k)
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Precomputed answers for the most frequently asked questions.
+
+A warm-up pass answers a list of canonical questions (the app's example
+questions plus the most popular logged queries) through the normal chat
+pipeline and stores each question's query embedding, retrieval results and
+final answer in a store file keyed by corpus version: the live index
+generation, embedding dimension and a digest of the corpus file. The chat
+path looks questions up in the store for the current version first, so a
+rebuild or refresh automatically stops serving answers from the old corpus.
+
+Usage:
+    python answer_store.py warm [--popular 20]
+    python answer_store.py status
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from index_generations import write_json_atomic
+from utils import ERROR_RESPONSE_PREFIX, EXAMPLE_QUESTIONS, answer_question
+
+ANSWER_STORE_DIR = os.getenv("ANSWER_STORE_DIR", "output/answer_store")
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "output/query_log.jsonl")
+# The log is rotated to "<path>.1" at this size, which also bounds what popular() reads
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", 5 * 1024 * 1024))
+
+# Logged questions added to the canonical list, and how often they must have been asked
+DEFAULT_POPULAR = 20
+MIN_POPULAR_COUNT = 3
+POPULAR_WINDOW_DAYS = 30
+
+# Store versions kept per index, so a rollback can still be served warm
+KEEP_VERSIONS = 3
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_TRUE = ("1", "true", "yes", "on")
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def _read_entries(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["entries"]
+    except FileNotFoundError:
+        return {}
+
+
+def normalize_question(question):
+    """Lookup key: case, punctuation and spacing don't make a question different"""
+    return _NON_WORD.sub(" ", question.lower()).strip()
+
+
+def _file_digest(path):
+    """SHA-256 of a file, recomputed only when its size or mtime changes"""
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        cached = _digests.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    with _digests_lock:
+        _digests[path] = (key, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def corpus_version(data_handler):
+    """Identifies the corpus and index that answers were computed against"""
+    generation = data_handler.active_generation() or "legacy"
+    return f"{generation}-{data_handler.embedding_dimension}d-{_file_digest(data_handler.data_path)[:12]}"
+
+
+def query_logging_enabled():
+    """True if the operator opted in to logging asked questions with LOG_QUERIES=1"""
+    return os.getenv("LOG_QUERIES", "").strip().lower() in _TRUE
+
+
+class QueryLog:
+    """
+    Append-only JSONL log of asked questions, used to find the popular ones.
+
+    Nothing is recorded unless enabled (default: LOG_QUERIES). Once the log
+    reaches max_bytes it is rotated to "<path>.1", replacing the previous
+    rotation, so the log and every popular() scan stay within 2 * max_bytes.
+    """
+
+    def __init__(self, path=QUERY_LOG_PATH, enabled=None, max_bytes=QUERY_LOG_MAX_BYTES):
+        self.path = path
+        self.enabled = query_logging_enabled() if enabled is None else enabled
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def rotated_path(self):
+        return f"{self.path}.1"
+
+    def record(self, question):
+        if not self.enabled or not self.path:
+            return
+        line = json.dumps({"question": question, "at": time.time()}, ensure_ascii=False)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            try:
+                if os.path.getsize(self.path) >= self.max_bytes:
+                    os.replace(self.path, self.rotated_path)
+            except FileNotFoundError:
+                pass
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def popular(self, limit=DEFAULT_POPULAR, min_count=MIN_POPULAR_COUNT, window_days=POPULAR_WINDOW_DAYS):
+        """Most asked questions in the window, each in its most recent wording"""
+        if not self.path:
+            return []
+        since = time.time() - window_days * 86400
+        counts = Counter()
+        wording = {}
+        # Oldest first, so the most recent wording wins
+        for path in (self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("at", 0) < since:
+                        continue
+                    key = normalize_question(record["question"])
+                    if key:
+                        counts[key] += 1
+                        wording[key] = record["question"]
+        return [wording[key] for key, count in counts.most_common(limit) if count >= min_count]
+
+
+def canonical_questions(popular=DEFAULT_POPULAR, query_log=None):
+    """The app's example questions followed by the most popular logged ones"""
+    questions = [question for _, question in EXAMPLE_QUESTIONS]
+    if popular:
+        questions += (query_log or QueryLog()).popular(limit=popular)
+    seen = set()
+    unique = []
+    for question in questions:
+        key = normalize_question(question)
+        if key not in seen:
+            seen.add(key)
+            unique.append(question)
+    return unique
+
+
+class AnswerStore:
+    """
+    Read side of the store, for the chat path. Each lookup checks the corpus
+    version (a few stat() calls) and reloads the store file only when the
+    version or the file changes.
+    """
+
+    def __init__(self, data_handler, store_dir=ANSWER_STORE_DIR):
+        self.data_handler = data_handler
+        self.store_dir = os.path.join(store_dir, data_handler.index_name)
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._entries = {}
+
+    def path(self, version):
+        return os.path.join(self.store_dir, f"{version}.json")
+
+    def _refresh(self):
+        version = corpus_version(self.data_handler)
+        path = self.path(version)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if self._loaded == (version, mtime):
+                return
+            entries = _read_entries(path) if mtime is not None else {}
+            # Precomputed embeddings also spare the embedding call if an answer is ever recomputed
+            for entry in entries.values():
+                if entry.get("query_embedding"):
+                    self.data_handler.cache_query_embedding(entry["question"], entry["query_embedding"])
+            self._entries = entries
+            self._loaded = (version, mtime)
+
+    def lookup(self, question):
+        """Precomputed answer for question under the current corpus version, or None"""
+        self._refresh()
+        entry = self._entries.get(normalize_question(question))
+        return entry["answer"] if entry else None
+
+    def missing(self, questions):
+        """The questions without a precomputed answer under the current corpus version"""
+        self._refresh()
+        return [question for question in questions if normalize_question(question) not in self._entries]
+
+    def __len__(self):
+        self._refresh()
+        return len(self._entries)
+
+
+def prune_versions(store_dir, keep=KEEP_VERSIONS):
+    """Delete all but the newest keep store files"""
+    if not os.path.isdir(store_dir):
+        return []
+    files = sorted(
+        (os.path.join(store_dir, name) for name in os.listdir(store_dir) if name.endswith(".json")),
+        key=os.path.getmtime,
+        reverse=True
+    )
+    for path in files[keep:]:
+        os.remove(path)
+    return files[keep:]
+
+
+def warm_up(data_handler, questions=None, completion_client=None, store_dir=ANSWER_STORE_DIR):
+    """
+    Answer each canonical question through the chat pipeline and add the
+    results to the store for the current corpus version, keeping answers
+    already stored for other questions. Returns the store path.
+    """
+    start = time.perf_counter()
+    questions = questions if questions is not None else canonical_questions()
+    version = corpus_version(data_handler)
+    path = AnswerStore(data_handler, store_dir).path(version)
+    entries = _read_entries(path)
+    added = 0
+    for question in questions:
+        embedding = data_handler.embed_query(question)
+        trace = {}
+        answer = answer_question(data_handler, question, completion_client=completion_client, trace=trace)
+        if answer.startswith(ERROR_RESPONSE_PREFIX):
+            print(f"  ⚠️ Not storing a failed answer for '{question}'")
+            continue
+        entries[normalize_question(question)] = {
+            "question": question,
+            "answer": answer,
+            "query_embedding": list(embedding),
+            "retrieval": trace,
+            "created_at": time.time()
+        }
+        added += 1
+        print(f"  🔥 {question}")
+
+    write_json_atomic(path, {"version": version, "created_at": time.time(), "entries": entries},
+                      ensure_ascii=False)
+    prune_versions(os.path.dirname(path))
+    print(f"✅ Precomputed {added}/{len(questions)} answers for corpus version {version} "
+          f"({len(entries)} stored) in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+if __name__ == "__main__":
+    from data_handler import DataHandler
+
+    parser = argparse.ArgumentParser(description="Precompute answers for canonical questions")
+    parser.add_argument("command", choices=("warm", "status"))
+    parser.add_argument("--index-name", help="Defaults to PINECONE_INDEX_NAME, else fidelity-financial-articles")
+    parser.add_argument("--data-path", default="output/fidelity_full_learning_center.json")
+    parser.add_argument("--popular", type=int, default=DEFAULT_POPULAR,
+                        help="Most popular logged questions to add to the example questions")
+    args = parser.parse_args()
+
+    handler = DataHandler(args.data_path, index_name=args.index_name)
+    if args.command == "warm":
+        warm_up(handler, canonical_questions(popular=args.popular))
+    else:
+        store = AnswerStore(handler)
+        print(f"Corpus version {corpus_version(handler)}: {len(store)} precomputed answers")
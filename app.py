@@ -1,7 +1,11 @@
 import streamlit as st
 import os
 from data_handler import DataHandler
-from utils import build_prompt, get_openai_response
+from utils import EXAMPLE_QUESTIONS, answer_question
+from request_profiler import RequestProfiler, profiling_allowed, profiling_requested
+from refresh_worker import BUSY_STATES, read_status, request_rebuild, worker_running
+from answer_store import AnswerStore, QueryLog
+from contextlib import nullcontext
 import time
 
 # Page configuration
@@ -33,24 +37,11 @@ st.title("💰 OnlyFinance")
 # Expandable section for examples
 with st.expander("💡 **Try asking me about these topics:**"):
     col1, col2 = st.columns(2)
+    half = (len(EXAMPLE_QUESTIONS) + 1) // 2
     
-    with col1:
-        st.markdown("""
-        🏠 *"How do I buy my first house?"*
-        
-        🎓 *"What's the best way to save for college?"*
-        
-        💳 *"How do I manage credit card debt?"*
-        """)
-    
-    with col2:
-        st.markdown("""
-        📈 *"Should I invest in cryptocurrency?"*
-        
-        🏦 *"What are ETFs and how do they work?"*
-        
-        👴 *"How much should I save for retirement?"*
-        """)
+    for col, questions in ((col1, EXAMPLE_QUESTIONS[:half]), (col2, EXAMPLE_QUESTIONS[half:])):
+        with col:
+            st.markdown("\n\n".join(f'{emoji} *"{question}"*' for emoji, question in questions))
 
 # Check if API keys are available (from .env file)
 missing_keys = []
@@ -85,14 +76,29 @@ if "data_handler" not in st.session_state:
 
 data_handler = st.session_state["data_handler"]
 
+# Precomputed answers for canonical questions, and the log used to pick them
+if "answer_store" not in st.session_state:
+    st.session_state["answer_store"] = AnswerStore(data_handler)
+query_log = QueryLog()
+
+# One sidebar section for every operator control; its header is only written once a control needs it
+admin_controls = st.sidebar.container()
+admin_header_shown = False
+
+def admin_section():
+    global admin_header_shown
+    if not admin_header_shown:
+        admin_controls.markdown("### 🔧 Admin Controls")
+        admin_header_shown = True
+    return admin_controls
+
 # Initialize collection in session state if it doesn't exist
 if "collection" not in st.session_state:
     # Check if the Pinecone index has data
     with st.spinner("🔍 Checking for existing financial data..."):
         if data_handler.check_collection_exists():
-            # Show collapsible admin section in sidebar only if needed
-            with st.sidebar:
-                st.markdown("### 🔧 Admin Controls")
+            # Show the admin section in the sidebar only if needed
+            with admin_section():
                 use_existing = st.radio(
                     "Data Management:",
                     ["Use existing data", "Recreate collection"],
@@ -101,20 +107,33 @@ if "collection" not in st.session_state:
                 )
             
             if use_existing == "Recreate collection":
-                with st.spinner("🔄 Refreshing financial articles database..."):
-                    data_handler.delete_pinecone_collection()
-                    time.sleep(2)
-                    collection = data_handler.process_data_and_create_collection()
-                st.session_state["collection"] = collection
-                st.success("✅ Financial articles database refreshed!")
+                # Ingestion runs in refresh_worker.py, never in a user-facing request; the live index
+                # keeps serving until the worker has validated and switched in the new generation
+                if request_rebuild("Recreate collection (app)"):
+                    st.info("🔄 Asked the refresh worker to rebuild the financial articles database. "
+                            "Answers keep using the current data until the new version is validated and switched in.")
+                else:
+                    st.info("🔄 A rebuild is already queued.")
+                if not worker_running(read_status()):
+                    st.warning("⚠️ The refresh worker isn't running; start it with `python refresh_worker.py`.")
+                st.session_state["collection"] = data_handler.index
             else:
                 st.session_state["collection"] = data_handler.index
                 st.success("✅ Connected to existing financial knowledge base!")
         else:
-            with st.spinner("📚 Setting up your financial knowledge base for the first time..."):
-                collection = data_handler.process_data_and_create_collection()
-            st.session_state["collection"] = collection
-            st.success("✅ Financial knowledge base ready! You can now ask me anything about finance.")
+            # Building the index for the first time is the worker's job too
+            request_rebuild("Empty index at app start")
+            refresh = read_status()
+            if refresh and refresh.get("state") in BUSY_STATES and worker_running(refresh):
+                st.info(f"📚 The financial knowledge base is being built ({refresh['state']}). "
+                        "Reload this page in a few minutes.")
+            elif worker_running(refresh):
+                st.info("📚 Asked the refresh worker to build the financial knowledge base. "
+                        "Reload this page in a few minutes.")
+            else:
+                st.warning("📚 The financial knowledge base is empty. Start the refresh worker with "
+                           "`python refresh_worker.py` to build it, then reload this page.")
+            st.stop()
 
 # Chat interface with welcome message
 if "messages" not in st.session_state:
@@ -142,25 +161,40 @@ for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
+# Opt-in per-request profiling, only where the operator allows it (PROFILE_REQUESTS=allow or 1)
+profile_answers = None
+if profiling_allowed():
+    with admin_section():
+        if st.toggle("🔬 Profile answers", value=False,
+                     help="Write a CPU profile and memory snapshot of each answer to output/profiles"):
+            profile_answers = True
+
 # Chat input with better placeholder
 if prompt := st.chat_input("💬 Ask me about investing, budgeting, retirement, home buying, college savings, or any financial topic..."):
     st.session_state.messages.append({"role": "user", "content": prompt})
+    query_log.record(prompt)
     with st.chat_message("user"):
         st.markdown(prompt)
 
     # RAG flow with better status messages
-    with st.spinner("🔍 Searching through Fidelity's financial articles..."):
-        results = data_handler.query_pinecone(prompt)  # Fixed: was query_chroma
-        if results["documents"] and results["metadatas"]:
-            retrieved_chunks = results["documents"][0]
-            retrieved_metadatas = results["metadatas"][0]
-        else:
-            retrieved_chunks = []
-            retrieved_metadatas = []
-
-    full_prompt = build_prompt(prompt, retrieved_chunks)
-    with st.spinner("🤖 Crafting your personalized financial guidance..."):
-        response = get_openai_response(full_prompt, retrieved_metadatas)
+    stage_spinners = {
+        "retrieve": "🔍 Searching through Fidelity's financial articles...",
+        "completion": "🤖 Crafting your personalized financial guidance..."
+    }
+    
+    def chat_stage(name):
+        message = stage_spinners.get(name)
+        return st.spinner(message) if message else nullcontext()
+    
+    if profiling_requested(profile_answers or st.query_params.get("profile")):
+        with RequestProfiler(prompt) as profiler:
+            response = answer_question(data_handler, prompt, stage=profiler.wrap_stage(chat_stage),
+                                       answer_store=st.session_state["answer_store"])
+        if profiler.summary:
+            st.sidebar.caption(f"🔬 Profile saved to {profiler.paths['summary']}")
+    else:
+        response = answer_question(data_handler, prompt, stage=chat_stage,
+                                   answer_store=st.session_state["answer_store"])
 
     # Display response
     st.session_state.messages.append({"role": "assistant", "content": response})
@@ -188,6 +222,18 @@ if "collection" in st.session_state:
             st.metric("Total Articles", len(articles))
             st.metric("Categories", len(categories))
             
+            # Written by refresh_worker.py running as its own process
+            refresh = read_status()
+            if refresh:
+                if refresh.get("state") in BUSY_STATES:
+                    st.caption(f"🔄 Refresh worker busy ({refresh['state']})")
+                elif refresh.get("state") == "failed":
+                    st.caption(f"⚠️ Last refresh or rebuild failed, still serving the previous data: {refresh.get('error')}")
+                if refresh.get("last_success"):
+                    changes = refresh.get("changes", {})
+                    st.caption(f"🗓️ Corpus refreshed {time.strftime('%Y-%m-%d %H:%M', time.localtime(refresh['last_success']))} "
+                               f"(+{changes.get('added', 0)} / ~{changes.get('changed', 0)} / -{changes.get('removed', 0)} articles)")
+            
             # Show category breakdown
             st.markdown("**Categories:**")
             for category, count in categories.items():
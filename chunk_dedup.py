@@ -0,0 +1,178 @@
+import json
+import re
+import zlib
+
+import numpy as np
+
+from utils import count_tokens
+
+# Mersenne prime used for the universal hash family (a * x + b) mod p
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingle_hashes(text, shingle_size=5):
+    """Hash the word k-shingles of a text to 32-bit values (held as uint64 for the permutation math)"""
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    k = min(shingle_size, len(words))
+    shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    return np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+
+
+def choose_bands(num_perm, threshold):
+    """
+    Pick an LSH (bands, rows) split of num_perm whose S-curve threshold
+    (1/bands) ** (1/rows) is closest to the requested similarity threshold.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHashDeduplicator:
+    """
+    Near-duplicate detection for text chunks using MinHash signatures and
+    banded locality-sensitive hashing.
+
+    Signatures for a whole batch of chunks are computed at once: every
+    shingle hash of every chunk is permuted by all hash functions in one
+    (num_perm x total_shingles) array operation, and np.minimum.reduceat
+    collapses each chunk's column range into its signature.
+    """
+
+    def __init__(self, threshold=0.85, num_perm=128, shingle_size=5, seed=42, batch_size=512):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.batch_size = batch_size
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+
+        rng = np.random.default_rng(seed)
+        # a, b < 2**32 keeps a * x + b inside uint64 for 32-bit shingle hashes
+        self._a = rng.integers(1, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+
+    def signatures(self, texts):
+        """Compute a (len(texts), num_perm) MinHash signature matrix"""
+        result = np.full((len(texts), self.num_perm), MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(texts), self.batch_size):
+            batch = [shingle_hashes(t, self.shingle_size) for t in texts[start:start + self.batch_size]]
+            lengths = np.array([len(h) for h in batch])
+            non_empty = np.nonzero(lengths)[0]
+            if len(non_empty) == 0:
+                continue
+
+            all_hashes = np.concatenate([batch[i] for i in non_empty])
+            permuted = ((self._a * all_hashes + self._b) % MERSENNE_PRIME) & MAX_HASH
+            offsets = np.concatenate(([0], np.cumsum(lengths[non_empty])[:-1]))
+            result[start + non_empty] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        return result
+
+    def find_duplicates(self, texts):
+        """
+        Return {duplicate_index: kept_index} for every text that is a near
+        duplicate of an earlier one. The first occurrence is always kept.
+        """
+        signatures = self.signatures(texts)
+        buckets = [{} for _ in range(self.bands)]
+        duplicates = {}
+
+        for i, signature in enumerate(signatures):
+            band_keys = [
+                signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)
+            ]
+
+            candidates = set()
+            for band, key in enumerate(band_keys):
+                candidates.update(buckets[band].get(key, ()))
+
+            match = None
+            if candidates:
+                candidate_ids = np.fromiter(sorted(candidates), dtype=np.int64)
+                similarity = (signatures[candidate_ids] == signature).mean(axis=1)
+                best = int(np.argmax(similarity))
+                if similarity[best] >= self.threshold:
+                    match = int(candidate_ids[best])
+
+            if match is not None:
+                duplicates[i] = match
+                continue
+
+            for band, key in enumerate(band_keys):
+                buckets[band].setdefault(key, []).append(i)
+
+        return duplicates
+
+
+def estimate_vector_bytes(doc, dimension):
+    """Approximate index storage for one chunk: float32 values plus JSON metadata"""
+    metadata = dict(doc["metadata"], text=doc["text"])
+    return dimension * 4 + len(json.dumps(metadata, ensure_ascii=False).encode("utf-8"))
+
+
+def dedup_chunks(docs, threshold=0.85, num_perm=128, shingle_size=5, dimension=1536, group_key=None):
+    """
+    Drop near-duplicate chunks before embedding.
+
+    With group_key, chunks are only compared with chunks of the same
+    group_key(doc), so a chunk is never dropped in favour of one that
+    lives in another group.
+
+    Returns (kept_docs, report) where report counts the chunks, embedding
+    tokens and index bytes that no longer need to be paid for.
+    """
+    if not docs:
+        return docs, {"total_chunks": 0, "kept_chunks": 0, "removed_chunks": 0,
+                      "tokens_saved": 0, "bytes_saved": 0}
+
+    deduplicator = MinHashDeduplicator(threshold=threshold, num_perm=num_perm, shingle_size=shingle_size)
+    groups = {}
+    for i, doc in enumerate(docs):
+        groups.setdefault(group_key(doc) if group_key else None, []).append(i)
+    duplicates = {}
+    for members in groups.values():
+        found = deduplicator.find_duplicates([docs[i]["text"] for i in members])
+        duplicates.update({members[dup]: members[kept] for dup, kept in found.items()})
+
+    kept_docs = []
+    tokens_saved = 0
+    bytes_saved = 0
+    for i, doc in enumerate(docs):
+        if i in duplicates:
+            tokens_saved += count_tokens(doc["text"])
+            bytes_saved += estimate_vector_bytes(doc, dimension)
+        else:
+            kept_docs.append(doc)
+
+    report = {
+        "total_chunks": len(docs),
+        "kept_chunks": len(kept_docs),
+        "removed_chunks": len(duplicates),
+        "tokens_saved": tokens_saved,
+        "bytes_saved": bytes_saved
+    }
+    return kept_docs, report
+
+
+def print_dedup_report(report):
+    print(f"🧹 Near-duplicate filter: kept {report['kept_chunks']}/{report['total_chunks']} chunks "
+          f"(removed {report['removed_chunks']})")
+    print(f"   Saved ~{report['tokens_saved']:,} embedding tokens and "
+          f"~{report['bytes_saved'] / 1024:.1f} KB of index storage")
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Extractive compression of retrieved context before the completion call.
+
+Retrieved chunks are split into sentences, every sentence is scored against
+the question by IDF-weighted term overlap (one sentences x query-terms matrix
+for the whole context), and only the best sentences are kept, in their
+original order, up to a share of the original tokens or a fixed token budget.
+
+Benchmark on the example questions:
+    python context_compression.py --backend local
+    python context_compression.py --backend live --ratio 0.4 --repeats 3
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+
+from utils import count_tokens
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words are compared by prefix so "investing" matches "invest" and "bonds" matches "bond"
+STEM_LENGTH = 6
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can could do does for from had has have how i if in into is it its
+me my of on or our should so than that the their them then there these they this to was we
+what when where which who why will with would you your about more most much many any some
+""".split())
+
+# Share of the retrieved tokens kept by default
+DEFAULT_RATIO = 0.5
+
+
+def split_sentences(text):
+    return [s.strip() for s in SENTENCE_PATTERN.split(text.strip()) if s.strip()]
+
+
+def _terms(text):
+    return [w[:STEM_LENGTH] for w in WORD_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+
+
+def score_sentences(query, sentences):
+    """
+    Relevance of each sentence to the query: summed IDF of the query terms
+    it contains, damped by sentence length so long sentences don't win on
+    size alone. IDF is computed over the candidate sentences themselves.
+    """
+    query_terms = sorted(set(_terms(query)))
+    if not query_terms or not sentences:
+        return np.zeros(len(sentences))
+
+    column = {term: j for j, term in enumerate(query_terms)}
+    hits = np.zeros((len(sentences), len(query_terms)), dtype=bool)
+    lengths = np.ones(len(sentences))
+    for i, sentence in enumerate(sentences):
+        terms = _terms(sentence)
+        lengths[i] = max(len(terms), 1)
+        for term in terms:
+            j = column.get(term)
+            if j is not None:
+                hits[i, j] = True
+
+    df = hits.sum(axis=0)
+    idf = np.log((len(sentences) + 1) / (df + 1)) + 1.0
+    return (hits @ idf) / np.sqrt(lengths)
+
+
+class ContextCompressor:
+    """
+    Keep the highest-scoring sentences of the retrieved chunks.
+
+    ratio is the share of the original context tokens to keep; token_budget,
+    when set, is an absolute cap instead. The single best sentence is always
+    kept, and if no sentence shares a term with the question the context is
+    passed through untouched rather than guessed at. verbose prints a line
+    per compressed context.
+    """
+
+    def __init__(self, ratio=DEFAULT_RATIO, token_budget=None, verbose=False):
+        if token_budget is None and not 0 < ratio <= 1:
+            raise ValueError("ratio must be in (0, 1]")
+        self.ratio = ratio
+        self.token_budget = token_budget
+        self.verbose = verbose
+        self.totals = {"calls": 0, "original_tokens": 0, "compressed_tokens": 0, "seconds": 0.0}
+
+    def compress(self, query, chunks, metadatas=None):
+        """
+        Returns (chunks, metadatas, stats) with emptied chunks and their
+        metadata dropped, so only sources that still contribute are cited.
+        """
+        start = time.perf_counter()
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(chunks)
+
+        sentences = []
+        owner = []
+        for c, chunk in enumerate(chunks):
+            for sentence in split_sentences(chunk):
+                sentences.append(sentence)
+                owner.append(c)
+        tokens = np.array([count_tokens(s) for s in sentences], dtype=np.int64)
+        original_tokens = int(tokens.sum())
+
+        scores = score_sentences(query, sentences)
+        if not len(sentences) or scores.max() <= 0:
+            kept_chunks, kept_metadatas = list(chunks), metadatas
+            kept_tokens = original_tokens
+            sentences_kept = len(sentences)
+        else:
+            budget = self.token_budget if self.token_budget is not None else self.ratio * original_tokens
+            # Best first, earlier sentences winning ties; keep while the running total fits
+            order = np.lexsort((np.arange(len(scores)), -scores))
+            order = order[scores[order] > 0]
+            fits = np.cumsum(tokens[order]) <= budget
+            fits[0] = True
+            keep = np.zeros(len(sentences), dtype=bool)
+            keep[order[fits]] = True
+
+            kept = {}
+            for i in np.nonzero(keep)[0]:
+                kept.setdefault(owner[i], []).append(sentences[i])
+            kept_chunks = [" ".join(kept[c]) for c in sorted(kept)]
+            kept_metadatas = [metadatas[c] for c in sorted(kept)]
+            kept_tokens = int(tokens[keep].sum())
+            sentences_kept = int(keep.sum())
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "original_tokens": original_tokens,
+            "compressed_tokens": kept_tokens,
+            "ratio": round(kept_tokens / original_tokens, 3) if original_tokens else 1.0,
+            "sentences": len(sentences),
+            "sentences_kept": sentences_kept,
+            "seconds": elapsed
+        }
+        self.totals["calls"] += 1
+        self.totals["original_tokens"] += original_tokens
+        self.totals["compressed_tokens"] += kept_tokens
+        self.totals["seconds"] += elapsed
+        if self.verbose:
+            print(f"🗜️ Context compressed {original_tokens} → {kept_tokens} tokens "
+                  f"({stats['ratio']:.0%}, {len(kept_chunks)}/{len(chunks)} chunks) in {elapsed * 1000:.1f}ms")
+        return kept_chunks, kept_metadatas, stats
+
+    def overall_ratio(self):
+        original = self.totals["original_tokens"]
+        return self.totals["compressed_tokens"] / original if original else 1.0
+
+
+def _benchmark(args):
+    from data_handler import DataHandler
+    from utils import EXAMPLE_QUESTIONS, build_prompt
+
+    data_path = "output/fidelity_full_learning_center.json"
+    if args.backend == "local":
+        from local_backends import build_local_backends
+        index, embeddings, _ = build_local_backends(DataHandler, data_path)
+        handler = DataHandler(data_path, index=index, embedding_function=embeddings, alias_dir=None)
+        client = None
+    else:
+        from openai import OpenAI
+        from record_replay import openai_http_client
+        handler = DataHandler(data_path)
+        client = OpenAI(http_client=openai_http_client())
+
+    compressor = ContextCompressor(ratio=args.ratio, token_budget=args.token_budget)
+    rows = []
+    for _, question in EXAMPLE_QUESTIONS:
+        results = handler.query_pinecone(question, top_k=args.top_k)
+        chunks, metadatas = results["documents"][0], results["metadatas"][0]
+        compressed, _, stats = compressor.compress(question, chunks, metadatas)
+        row = {
+            "question": question,
+            "full_prompt": count_tokens(build_prompt(question, chunks)),
+            "compressed_prompt": count_tokens(build_prompt(question, compressed)),
+            "compress_ms": stats["seconds"] * 1000
+        }
+        if client is not None:
+            for name, context in (("full", chunks), ("compressed", compressed)):
+                timings = []
+                for _ in range(args.repeats):
+                    start = time.perf_counter()
+                    client.chat.completions.create(
+                        model="gpt-3.5-turbo",
+                        messages=[{"role": "user", "content": build_prompt(question, context)}],
+                        temperature=0.7,
+                        max_tokens=1500
+                    )
+                    timings.append(time.perf_counter() - start)
+                row[f"{name}_ms"] = float(np.median(timings)) * 1000
+        rows.append(row)
+
+    print(f"{'question':<45}{'prompt tok':>12}{'compressed':>12}{'compress ms':>13}"
+          + (f"{'full ms':>10}{'compr. ms':>11}" if client else ""))
+    for row in rows:
+        line = f"{row['question'][:44]:<45}{row['full_prompt']:>12}{row['compressed_prompt']:>12}{row['compress_ms']:>13.2f}"
+        if client:
+            line += f"{row['full_ms']:>10.0f}{row['compressed_ms']:>11.0f}"
+        print(line)
+
+    full = sum(r["full_prompt"] for r in rows)
+    compressed = sum(r["compressed_prompt"] for r in rows)
+    print(f"\n📉 Prompt tokens {full} → {compressed} ({compressed / full:.0%}); "
+          f"context kept {compressor.overall_ratio():.0%}, "
+          f"compression overhead {np.mean([r['compress_ms'] for r in rows]):.2f}ms per question")
+    if client:
+        saved = np.median([r["full_ms"] - r["compressed_ms"] for r in rows])
+        print(f"⏱️ Median completion latency saved: {saved:.0f}ms per question")
+    else:
+        print("   Run with --backend live to time gpt-3.5-turbo on both prompts")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark extractive context compression on the example questions")
+    parser.add_argument("--backend", choices=("local", "live"), default="local")
+    parser.add_argument("--ratio", type=float, default=DEFAULT_RATIO)
+    parser.add_argument("--token-budget", type=int, default=None)
+    parser.add_argument("--top-k", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=3, help="Completions per prompt variant (live backend)")
+    _benchmark(parser.parse_args())
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+from collections import Counter, deque
+from urllib.parse import urljoin, urlparse, urlunparse
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Fetch attempts, across resumed runs, before a URL that keeps failing is given up on
+MAX_ATTEMPTS = 3
+
+
+def normalize_url(url, base_url=None):
+    """
+    Normalize a URL so that trivially different spellings of the same page
+    collapse to one key.
+
+    Resolves relative links against base_url, lowercases scheme and host,
+    drops default ports, query strings and fragments, and strips trailing
+    slashes. Returns None for non-http(s) links (mailto:, javascript:, ...).
+    """
+    if not url:
+        return None
+    url = url.strip()
+    if base_url:
+        url = urljoin(base_url, url)
+
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return None
+
+    host = (parsed.hostname or "").lower()
+    if not host:
+        return None
+    if parsed.port and parsed.port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{parsed.port}"
+
+    path = parsed.path or "/"
+    while "//" in path:
+        path = path.replace("//", "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    return urlunparse((scheme, host, path, "", "", ""))
+
+
+def url_fingerprint(url):
+    """64-bit fingerprint of a normalized URL, used as the seen-set key"""
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class CrawlFrontier:
+    """
+    Breadth-first crawl frontier with a compact seen-set and append-only
+    on-disk checkpoints.
+
+    Two JSONL logs live in checkpoint_dir:
+      - frontier.jsonl: one {"op": "add"} record per discovered URL, one
+        {"op": "done"} record per URL whose processing finished and one
+        {"op": "failed"} record per fetch that raised
+      - articles.jsonl: one scraped article per line
+
+    Re-opening a frontier on the same directory replays both logs, so an
+    interrupted crawl resumes with exactly the URLs that were still pending,
+    plus failed URLs that have not used up MAX_ATTEMPTS; URLs that have are
+    listed in given_up. max_pages limits the pages processed by this run,
+    not the total across runs.
+    """
+
+    FRONTIER_FILE = "frontier.jsonl"
+    ARTICLES_FILE = "articles.jsonl"
+
+    def __init__(self, checkpoint_dir, max_depth=2, max_pages=None):
+        self.checkpoint_dir = checkpoint_dir
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+
+        self.frontier_path = os.path.join(checkpoint_dir, self.FRONTIER_FILE)
+        self.articles_path = os.path.join(checkpoint_dir, self.ARTICLES_FILE)
+
+        self.seen = set()
+        self.pending = deque()
+        self.processed_count = 0
+        self.article_count = 0
+        # Pages processed since this frontier was opened, which max_pages applies to
+        self.run_count = 0
+        # URLs whose fetch failed in this run, retried on the next resume
+        self.failed = []
+        # URLs that failed MAX_ATTEMPTS times and will not be fetched again
+        self.given_up = []
+        self._failures = Counter()
+
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self._replay()
+
+        self._frontier_log = self._open_log(self.frontier_path)
+        self._articles_log = self._open_log(self.articles_path)
+
+    def _replay(self):
+        """Rebuild seen-set and pending queue from the checkpoint logs"""
+        if os.path.exists(self.frontier_path):
+            entries = {}
+            done = set()
+            with open(self.frontier_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    record = self._parse_line(line)
+                    if record is None:
+                        continue
+                    key = url_fingerprint(record["url"])
+                    if record["op"] == "add":
+                        self.seen.add(key)
+                        entries.setdefault(key, record)
+                    elif record["op"] == "done":
+                        done.add(key)
+                    elif record["op"] == "failed":
+                        self._failures[key] += 1
+
+            self.processed_count = len(done)
+            for key, record in entries.items():
+                if key in done:
+                    continue
+                if self._failures[key] < MAX_ATTEMPTS:
+                    self.pending.append((record["url"], record["depth"], record.get("text", "")))
+                else:
+                    self.given_up.append(record["url"])
+
+        if os.path.exists(self.articles_path):
+            self.article_count = len(self._read_articles())
+
+        if self.seen:
+            print(f"♻️ Resuming crawl: {self.processed_count} pages done, "
+                  f"{len(self.pending)} pending, {self.article_count} articles saved")
+            if self.given_up:
+                print(f"⚠️ {len(self.given_up)} URLs were given up on after {MAX_ATTEMPTS} failed attempts")
+
+    @staticmethod
+    def _open_log(path):
+        """Open a log for appending, terminating any line truncated by a crash"""
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        log = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            log.write("\n")
+        return log
+
+    @staticmethod
+    def _parse_line(line):
+        # A crash mid-write can leave a truncated last line; ignore it
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return None
+
+    def _append(self, log, record):
+        log.write(json.dumps(record, ensure_ascii=False) + "\n")
+        log.flush()
+
+    def add(self, url, depth, text="", base_url=None):
+        """Normalize and enqueue a URL; returns False if it was already seen or too deep"""
+        if depth > self.max_depth:
+            return False
+        normalized = normalize_url(url, base_url)
+        if normalized is None:
+            return False
+        key = url_fingerprint(normalized)
+        if key in self.seen:
+            return False
+
+        self.seen.add(key)
+        self.pending.append((normalized, depth, text))
+        self._append(self._frontier_log, {"op": "add", "url": normalized, "depth": depth, "text": text})
+        return True
+
+    def next(self):
+        """Pop the next (url, depth, text) to crawl, or None when finished"""
+        if self.max_pages is not None and self.run_count >= self.max_pages:
+            return None
+        if not self.pending:
+            return None
+        return self.pending.popleft()
+
+    def mark_done(self, url, article=None):
+        """Record that a URL was processed, saving its article if one was extracted"""
+        if article is not None:
+            self._append(self._articles_log, article)
+            self.article_count += 1
+        self._append(self._frontier_log, {"op": "done", "url": url})
+        self.processed_count += 1
+        self.run_count += 1
+
+    def mark_failed(self, url, error=None):
+        """
+        Record a fetch that raised; the URL stays pending for the next resumed
+        run until it has failed MAX_ATTEMPTS times, then it is given up on
+        """
+        self._append(self._frontier_log, {"op": "failed", "url": url, "error": error})
+        key = url_fingerprint(url)
+        self._failures[key] += 1
+        if self._failures[key] < MAX_ATTEMPTS:
+            self.failed.append(url)
+        else:
+            self.given_up.append(url)
+        self.run_count += 1
+
+    def has_pending(self):
+        """True while URLs are queued or failed ones are left to retry"""
+        return bool(self.pending or self.failed)
+
+    def _read_articles(self):
+        # A URL interrupted between its article and "done" records is crawled
+        # again on resume, so keep only the latest article per URL
+        articles = {}
+        with open(self.articles_path, "r", encoding="utf-8") as f:
+            for line in f:
+                article = self._parse_line(line)
+                if article is not None:
+                    articles[article.get("url", len(articles))] = article
+        return list(articles.values())
+
+    def load_articles(self):
+        """Read back every article saved so far, across all runs"""
+        if not os.path.exists(self.articles_path):
+            return []
+        self._articles_log.flush()
+        return self._read_articles()
+
+    def close(self):
+        self._frontier_log.close()
+        self._articles_log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -4,31 +4,150 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 import json
 import os
+import re
+import threading
 import uuid
 import time
+from collections import OrderedDict
+import numpy as np
+from adaptive_retrieval import AdaptiveTopK
+from chunk_dedup import dedup_chunks, print_dedup_report
+from embedding_scheduler import EmbeddingScheduler, DEFAULT_TOKENS_PER_MINUTE, DEFAULT_REQUESTS_PER_MINUTE
+from index_generations import (
+    ALIAS_DIR, DEFAULT_KEEP_PREVIOUS, IndexAlias, RebuildValidationError,
+    generation_namespace, ingestion_lock, new_generation_id, split_namespace
+)
+from record_replay import active_cassette, openai_http_client
+from utils import EXAMPLE_QUESTIONS, count_tokens
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Served index unless PINECONE_INDEX_NAME names another, e.g. a migrated "<index>-512d"
+DEFAULT_INDEX_NAME = "fidelity-financial-articles"
+
+# OpenAI text-embedding-3-small native dimension. The model can also return
+# shortened embeddings (e.g. 512 or 256) via its dimensions parameter
+EMBEDDING_DIMENSION = 1536
+
+# Pinecone recommends upserting at most ~100 vectors of this size per request
+UPSERT_BATCH_SIZE = 100
+
+DEFAULT_CATEGORY = "Other"
+
+# Query embeddings kept per handler, so repeated and warmed-up questions skip the embedding call
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# How long a new generation may take to show its full vector count in index stats
+VALIDATION_TIMEOUT = 120
+
+# Cheap keyword router from question wording to likely Learning Center categories.
+# Keywords match whole words, plus a plural "s"/"es", so "option" matches "options"
+# but not "optional"; a trailing "*" matches any word starting with the stem, so
+# "invest*" also matches "investing".
+CATEGORY_KEYWORDS = {
+    "Financial Essentials": ["budget*", "saving", "savings", "debt", "credit card", "credit score", "tax",
+                             "save", "charit*", "donat*", "student", "income", "paycheck", "retire*",
+                             "health care", "estate"],
+    "Life Events": ["college", "house", "home*", "mortgage", "marri*", "wedding", "divorce*", "aging", "elder*",
+                    "career", "job", "self-employ*", "parent*", "child*", "kid", "baby", "babies", "disabilit*",
+                    "special needs", "illness", "injur*", "loved one", "death", "caregiv*"],
+    "Investing and Trading": ["invest*", "trade", "trading", "trader", "crypto*", "bitcoin", "margin",
+                              "technical analysis", "fundamental", "sector", "strateg*", "webinar", "portfolio"],
+    "Investment Products": ["stock", "bond", "cd", "fixed income", "etf", "mutual fund",
+                            "closed-end", "annuit*", "option"],
+    "Advanced Trading": ["active trader", "technical indicator", "strategy guide", "short sell*", "day trad*"],
+}
+
+def _keyword_pattern(keyword):
+    if keyword.endswith("*"):
+        return re.escape(keyword[:-1]) + r"\w*"
+    return re.escape(keyword) + "(?:e?s)?"
+
+_CATEGORY_PATTERNS = {
+    category: re.compile(r"\b(?:" + "|".join(_keyword_pattern(k) for k in keywords) + r")\b", re.IGNORECASE)
+    for category, keywords in CATEGORY_KEYWORDS.items()
+}
+
+def category_namespace(category):
+    """Pinecone namespace holding one category's vectors, e.g. 'life-events'"""
+    slug = re.sub(r"[^a-z0-9]+", "-", (category or DEFAULT_CATEGORY).lower()).strip("-")
+    return slug or category_namespace(DEFAULT_CATEGORY)
+
+def route_categories(query):
+    """
+    Pick the categories a question most likely belongs to by keyword match.
+    Returns None when nothing matches, meaning every category should be searched.
+    """
+    matched = [category for category, pattern in _CATEGORY_PATTERNS.items() if pattern.search(query)]
+    if not matched:
+        return None
+    # Uncategorized articles could answer anything, so always include them
+    return matched + [DEFAULT_CATEGORY]
 
 class DataHandler:
     def __init__(
         self,
         data_path,
-        index_name="fidelity-financial-articles",
-        pinecone_api_key=None
+        index_name=None,
+        pinecone_api_key=None,
+        dedup_threshold=0.85,
+        route_queries=True,
+        index=None,
+        embedding_function=None,
+        alias_dir=ALIAS_DIR,
+        embedding_dimension=None,
+        adaptive_top_k=None
     ):
         self.data_path = data_path
-        self.index_name = index_name
+        self.index_name = index_name or os.getenv("PINECONE_INDEX_NAME", DEFAULT_INDEX_NAME)
+        # Jaccard similarity above which a chunk counts as a near duplicate (None disables)
+        self.dedup_threshold = dedup_threshold
+        # Search only the namespaces of keyword-routed categories when no filter is given
+        self.route_queries = route_queries
+        # Trim over-fetched candidates by score unless a fixed top_k is asked for (False disables)
+        self.adaptive_top_k = AdaptiveTopK.from_env() if adaptive_top_k is None else (adaptive_top_k or None)
+        self._namespaces = None
+        self._query_embeddings = OrderedDict()
+        self._query_embeddings_lock = threading.Lock()
+        # Shortened embeddings shrink the index, every payload and search time
+        self.embedding_dimension = int(embedding_dimension or os.getenv("EMBEDDING_DIMENSION", EMBEDDING_DIMENSION))
+        # Only send dimensions when shortening, so native requests stay unchanged
+        dimensions = self.embedding_dimension if self.embedding_dimension != EMBEDDING_DIMENSION else None
+        # Pointer to the live blue/green generation (None pins the legacy namespaces)
+        self.alias = IndexAlias(os.path.join(alias_dir, f"{self.index_name}.json")) if alias_dir else None
         
-        # Initialize Pinecone
-        self.pinecone_api_key = pinecone_api_key or os.getenv("PINECONE_API_KEY")
-        if not self.pinecone_api_key:
-            raise ValueError("Pinecone API key is required. Set PINECONE_API_KEY environment variable or pass it directly.")
+        # Route traffic through a record/replay cassette if one is configured
+        active_cassette()
         
-        self.pc = Pinecone(api_key=self.pinecone_api_key)
+        # Initialize Pinecone, unless an index-compatible backend was passed in
+        self.pc = None
+        if index is None:
+            self.pinecone_api_key = pinecone_api_key or os.getenv("PINECONE_API_KEY")
+            if not self.pinecone_api_key:
+                raise ValueError("Pinecone API key is required. Set PINECONE_API_KEY environment variable or pass it directly.")
+            
+            self.pc = Pinecone(api_key=self.pinecone_api_key)
+        
+        # OpenAI embeddings, unless an embeddings-compatible backend was passed in
+        self.embedding_function = embedding_function or OpenAIEmbeddings(
+            model=EMBEDDING_MODEL, dimensions=dimensions, http_client=openai_http_client()
+        )
         
-        # OpenAI embeddings
-        self.embedding_function = OpenAIEmbeddings(model="text-embedding-3-small")
+        # Rate-limited, token-packed embedding for bulk ingestion
+        self.embedding_scheduler = EmbeddingScheduler(
+            model=EMBEDDING_MODEL,
+            dimensions=dimensions,
+            tokens_per_minute=int(os.getenv("OPENAI_EMBEDDING_TPM", DEFAULT_TOKENS_PER_MINUTE)),
+            requests_per_minute=int(os.getenv("OPENAI_EMBEDDING_RPM", DEFAULT_REQUESTS_PER_MINUTE)),
+            # An injected backend embeds bulk ingestion too, so it never reaches OpenAI
+            embed_fn=embedding_function.embed_documents if embedding_function is not None else None
+        )
         
         # Check if index exists, create if not
-        self.setup_index()
+        if index is None:
+            self.setup_index()
+        else:
+            self.index = index
 
     def setup_index(self):
         """Create Pinecone index if it doesn't exist"""
@@ -37,12 +156,13 @@ class DataHandler:
             index_info = self.pc.describe_index(self.index_name)
             print(f"Index '{self.index_name}' exists with {index_info.status.ready} status")
             self.index = self.pc.Index(self.index_name)
+            index_dimension = index_info.dimension
         except Exception as e:
             print(f"Index '{self.index_name}' does not exist. Creating it...")
-            # Create index with OpenAI embedding dimensions (1536 for text-embedding-3-small)
+            # Create index with the configured embedding dimension (1536 native for text-embedding-3-small)
             self.pc.create_index(
                 name=self.index_name,
-                dimension=1536,  # OpenAI text-embedding-3-small dimension
+                dimension=self.embedding_dimension,
                 metric="cosine",
                 spec={
                     "serverless": {
@@ -59,6 +179,13 @@ class DataHandler:
             
             print(f"Index '{self.index_name}' created successfully!")
             self.index = self.pc.Index(self.index_name)
+            index_dimension = self.embedding_dimension
+        
+        if index_dimension != self.embedding_dimension:
+            raise ValueError(
+                f"Index '{self.index_name}' holds {index_dimension}-dimensional vectors but embeddings are "
+                f"configured for {self.embedding_dimension}; migrate with migrate_embeddings.py or pick another index"
+            )
 
     def load_data(self):
         """Load JSON file with {title, content} or {question, answer} format"""
@@ -74,7 +201,8 @@ class DataHandler:
                     converted_data.append({
                         "question": item["title"],
                         "answer": item["content"],
-                        "url": item.get("url", "")
+                        "url": item.get("url", ""),
+                        "category": item.get("category", DEFAULT_CATEGORY)
                     })
                 return converted_data
         
@@ -90,6 +218,7 @@ class DataHandler:
             question = item["question"]
             answer = item["answer"]
             url = item.get("url", "")
+            category = item.get("category") or DEFAULT_CATEGORY
 
             # Split into chunks
             chunks = text_splitter.split_text(answer)
@@ -100,65 +229,184 @@ class DataHandler:
                     "metadata": {
                         "source": question,
                         "url": url,
+                        "category": category,
                         "chunk_index": i
                     }
                 })
         return docs
 
-    def create_pinecone_collection(self, docs):
-        """Add documents to Pinecone index"""
+    def build_vectors(self, docs, embeddings):
+        """Pair chunks with their embeddings in Pinecone's upsert format"""
+        vectors = []
+        for doc, embedding in zip(docs, embeddings):
+            vectors.append({
+                "id": doc["id"],
+                "values": embedding,
+                "metadata": {
+                    "text": doc["text"],
+                    "source": doc["metadata"]["source"],
+                    "url": doc["metadata"]["url"],
+                    "category": doc["metadata"].get("category", DEFAULT_CATEGORY),
+                    "chunk_index": doc["metadata"]["chunk_index"]
+                }
+            })
+        return vectors
+
+    def active_generation(self):
+        """Generation queries are served from ("" for the legacy namespaces)"""
+        return self.alias.active() if self.alias else ""
+
+    def dedup(self, docs):
+        """
+        Drop near-duplicate chunks, if enabled. Chunks are only compared within
+        their category, since routed queries search one category's namespace
+        and must still find the chunk there.
+        """
+        if not self.dedup_threshold:
+            return docs
+        docs, report = dedup_chunks(docs, threshold=self.dedup_threshold, dimension=self.embedding_dimension,
+                                    group_key=lambda doc: doc["metadata"].get("category", DEFAULT_CATEGORY))
+        print_dedup_report(report)
+        return docs
+
+    def group_by_namespace(self, docs, generation=None):
+        """Split chunks into their category namespaces within a generation (default: the live one)"""
+        generation = self.active_generation() if generation is None else generation
+        namespaces = {}
+        for doc in docs:
+            category = doc["metadata"].get("category", DEFAULT_CATEGORY)
+            namespace = generation_namespace(generation, category_namespace(category))
+            namespaces.setdefault(namespace, []).append(doc)
+        return namespaces
+
+    def create_pinecone_collection(self, docs, generation=None):
+        """Add documents to Pinecone index, one namespace per category"""
         print(f"Adding {len(docs)} document chunks to Pinecone...")
         
-        # Batch process documents
-        batch_size = 100
-        for i in range(0, len(docs), batch_size):
-            batch = docs[i:i + batch_size]
-            
-            # Generate embeddings for the batch
-            texts = [doc["text"] for doc in batch]
-            embeddings = self.embedding_function.embed_documents(texts)
-            
-            # Prepare vectors for Pinecone
-            vectors = []
-            for j, doc in enumerate(batch):
-                vectors.append({
-                    "id": doc["id"],
-                    "values": embeddings[j],
-                    "metadata": {
-                        "text": doc["text"],
-                        "source": doc["metadata"]["source"],
-                        "url": doc["metadata"]["url"],
-                        "chunk_index": doc["metadata"]["chunk_index"]
-                    }
-                })
+        # Group documents by category namespace
+        namespaces = self.group_by_namespace(docs, generation=generation)
+        
+        self.embedding_scheduler.reset_metrics()
+        for namespace, namespace_docs in namespaces.items():
+            texts = [doc["text"] for doc in namespace_docs]
             
-            # Upsert to Pinecone
-            self.index.upsert(vectors=vectors)
-            print(f"Processed batch {i//batch_size + 1}/{(len(docs) + batch_size - 1)//batch_size}")
+            # Requests are packed by token count and paced to the rate limits
+            for start, end, embeddings in self.embedding_scheduler.embed_batches(texts):
+                # Prepare vectors for Pinecone
+                vectors = self.build_vectors(namespace_docs[start:end], embeddings)
+                
+                # Upsert to Pinecone
+                for i in range(0, len(vectors), UPSERT_BATCH_SIZE):
+                    self.index.upsert(vectors=vectors[i:i + UPSERT_BATCH_SIZE], namespace=namespace)
+                print(f"[{namespace}] Processed {end}/{len(namespace_docs)} chunks")
         
+        self.embedding_scheduler.print_metrics()
+        self._namespaces = None
         print("All documents added to Pinecone successfully!")
 
-    def query_pinecone(self, query, top_k=2):
-        """Query Pinecone index"""
+    def embed_query(self, query):
+        """Embed a query, reusing cached embeddings of identical queries"""
+        with self._query_embeddings_lock:
+            embedding = self._query_embeddings.get(query)
+            if embedding is not None:
+                self._query_embeddings.move_to_end(query)
+                return embedding
+        embedding = self.embedding_function.embed_query(query)
+        self.cache_query_embedding(query, embedding)
+        return embedding
+
+    def cache_query_embedding(self, query, embedding):
+        with self._query_embeddings_lock:
+            self._query_embeddings[query] = embedding
+            self._query_embeddings.move_to_end(query)
+            while len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+
+    def list_namespaces(self, refresh=False, generation=None):
+        """
+        Namespaces of one generation (default: the live one) currently holding
+        vectors, cached until the next ingest, delete or generation switch.
+        """
+        generation = self.active_generation() if generation is None else generation
+        if self._namespaces is None or refresh or self._namespaces[0] != generation:
+            stats = self.index.describe_index_stats()
+            names = sorted(stats.get("namespaces", {}).keys())
+            self._namespaces = (generation, [n for n in names if split_namespace(n)[0] == generation])
+        return self._namespaces[1]
+
+    def query_pinecone(self, query, top_k=None, categories=None, route=None, generation=None):
+        """
+        Query Pinecone index.
+
+        Without top_k, and when adaptive retrieval is enabled, candidates are
+        over-fetched once and trimmed by their similarity scores; otherwise
+        exactly top_k (default 2) matches are returned.
+
+        categories restricts the search to those categories' namespaces. Without
+        it, and when routing is enabled, categories are picked from the query
+        wording; if nothing matches, every namespace is searched. generation
+        defaults to the one the alias currently points at.
+        """
+        route = self.route_queries if route is None else route
+        routed = categories is None and route
+        if routed:
+            categories = route_categories(query)
+        
+        generation = self.active_generation() if generation is None else generation
+        available = self.list_namespaces(generation=generation)
+        if categories is None:
+            namespaces = available
+        else:
+            wanted = {generation_namespace(generation, category_namespace(category)) for category in categories}
+            namespaces = [namespace for namespace in available if namespace in wanted]
+            # Indexes built before category namespaces existed keep everything in
+            # the default namespace, so a routed guess must not hide it
+            if routed and not namespaces:
+                namespaces = available
+        
+        adaptive = self.adaptive_top_k if top_k is None else None
+        if top_k is None:
+            top_k = adaptive.candidates if adaptive else 2
+
         # Generate embedding for query
-        query_embedding = self.embedding_function.embed_query(query)
+        query_embedding = self.embed_query(query)
         
         # Search Pinecone
-        results = self.index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
+        if len(namespaces) == 1:
+            results = self.index.query(
+                vector=query_embedding,
+                top_k=top_k,
+                namespace=namespaces[0],
+                include_metadata=True
+            )
+        elif namespaces:
+            results = self.index.query_namespaces(
+                vector=query_embedding,
+                namespaces=namespaces,
+                metric="cosine",
+                top_k=top_k,
+                include_metadata=True
+            )
+        else:
+            results = {"matches": []}
+        
+        matches = results["matches"]
+        if adaptive and matches:
+            scores = np.fromiter((match["score"] for match in matches), dtype=np.float64, count=len(matches))
+            token_counts = np.fromiter((count_tokens(match["metadata"]["text"]) for match in matches),
+                                       dtype=np.int64, count=len(matches))
+            matches = matches[:adaptive.select(scores, token_counts)]
         
         # Format results to match what app.py expects
         documents = []
         metadatas = []
         
-        for match in results["matches"]:
+        for match in matches:
             documents.append(match["metadata"]["text"])
             metadatas.append({
                 "source": match["metadata"]["source"],
                 "url": match["metadata"]["url"],
+                "category": match["metadata"].get("category", DEFAULT_CATEGORY),
                 "score": match["score"]
             })
         
@@ -172,19 +420,185 @@ class DataHandler:
         """Full pipeline: load, chunk, embed, and save to Pinecone"""
         data = self.load_data()
         docs = self.chunk_data(data)
+        docs = self.dedup(docs)
         self.create_pinecone_collection(docs)
         return self.index
 
+    def rebuild_category(self, category, keep_previous=DEFAULT_KEEP_PREVIOUS, smoke_questions=None,
+                         timeout=VALIDATION_TIMEOUT):
+        """
+        Re-chunk and re-embed a single category into a new generation, with
+        every other category's vectors copied over from the live one, then
+        validate and switch it in like rebuild_generation (under the same
+        ingestion lock). Returns the new generation, or None if no article
+        belongs to the category.
+        """
+        urls = {item.get("url", "") for item in self.load_data()
+                if (item.get("category") or DEFAULT_CATEGORY) == category}
+        if not urls:
+            print(f"No articles found for category '{category}'")
+            return None
+        if not self.list_namespaces(refresh=True):
+            raise ValueError("The live generation is empty, so there are no other categories to carry over; "
+                             "run a full rebuild_generation instead")
+        return self.rebuild_generation(keep_previous=keep_previous, smoke_questions=smoke_questions,
+                                       timeout=timeout, changed_urls=urls)
+
+    def generation_counts(self):
+        """Vector count per generation present in the index"""
+        counts = {}
+        for name, info in self.index.describe_index_stats().get("namespaces", {}).items():
+            generation = split_namespace(name)[0]
+            counts[generation] = counts.get(generation, 0) + info["vector_count"]
+        return counts
+
+    def delete_generation(self, generation):
+        """Delete every namespace belonging to one generation"""
+        for namespace in self.list_namespaces(refresh=True, generation=generation):
+            self.index.delete(delete_all=True, namespace=namespace)
+        self._namespaces = None
+        print(f"Deleted generation '{generation or '(legacy)'}' from Pinecone index '{self.index_name}'")
+
+    def validate_generation(self, generation, expected_counts, smoke_questions=None, timeout=VALIDATION_TIMEOUT):
+        """
+        Check a freshly built generation before it goes live: every namespace
+        must report its full vector count (index stats lag behind upserts, so
+        this polls up to timeout seconds) and every smoke question must
+        retrieve at least one chunk.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            namespaces = self.index.describe_index_stats().get("namespaces", {})
+            counts = {ns: namespaces.get(ns, {}).get("vector_count", 0) for ns in expected_counts}
+            if counts == expected_counts:
+                break
+            if time.monotonic() >= deadline:
+                raise RebuildValidationError(
+                    f"Generation '{generation}' has {sum(counts.values())} vectors, "
+                    f"expected {sum(expected_counts.values())}"
+                )
+            time.sleep(2)
+        
+        smoke_questions = smoke_questions if smoke_questions is not None else [q for _, q in EXAMPLE_QUESTIONS]
+        for question in smoke_questions:
+            results = self.query_pinecone(question, generation=generation)
+            if not any(text.strip() for text in results["documents"][0]):
+                raise RebuildValidationError(f"Generation '{generation}' returned nothing for smoke query '{question}'")
+        print(f"Generation '{generation}' validated: {sum(counts.values())} vectors, "
+              f"{len(smoke_questions)} smoke queries answered")
+
+    def copy_generation_vectors(self, source_generation, target_generation, urls):
+        """
+        Copy the vectors of articles whose URL is in urls from one generation
+        to another without re-embedding, each into its category's namespace.
+        Returns the copied count per target namespace.
+        """
+        from index_snapshot import iter_namespace_vectors
+        
+        copied = {}
+        for source_namespace in self.list_namespaces(refresh=True, generation=source_generation):
+            for batch in iter_namespace_vectors(self.index, source_namespace):
+                # Place by category like group_by_namespace, since a legacy index keeps everything in one namespace
+                by_namespace = {}
+                for vector in batch:
+                    metadata = vector.metadata or {}
+                    if metadata.get("url", "") in urls:
+                        category = metadata.get("category", DEFAULT_CATEGORY)
+                        namespace = generation_namespace(target_generation, category_namespace(category))
+                        by_namespace.setdefault(namespace, []).append(
+                            {"id": vector.id, "values": vector.values, "metadata": metadata}
+                        )
+                for namespace, vectors in by_namespace.items():
+                    for i in range(0, len(vectors), UPSERT_BATCH_SIZE):
+                        self.index.upsert(vectors=vectors[i:i + UPSERT_BATCH_SIZE], namespace=namespace)
+                    copied[namespace] = copied.get(namespace, 0) + len(vectors)
+        self._namespaces = None
+        print(f"Copied {sum(copied.values())} unchanged vectors into generation '{target_generation}'")
+        return copied
+
+    def rebuild_generation(self, keep_previous=DEFAULT_KEEP_PREVIOUS, smoke_questions=None,
+                           timeout=VALIDATION_TIMEOUT, changed_urls=None):
+        """
+        Blue/green rebuild: load, chunk and embed into a new generation while
+        the live one keeps serving, validate it, atomically switch the alias
+        and garbage-collect generations beyond keep_previous. A generation that
+        fails validation is deleted and the live one is left untouched. Holds
+        the ingestion lock throughout, so it raises IngestionBusyError rather
+        than race another process's rebuild or garbage collection.
+
+        With changed_urls, only those articles are chunked and embedded; the
+        vectors of every other article still in the data file are copied over
+        from the live generation, and articles no longer in it are dropped.
+        """
+        if self.alias is None:
+            raise ValueError("Blue/green rebuilds need an alias_dir to store the live generation pointer")
+        
+        with ingestion_lock():
+            live = self.active_generation()
+            generation = new_generation_id(taken={*self.generation_counts(), *self.alias.previous()})
+            print(f"Building generation '{generation}' alongside live generation '{live or '(legacy)'}'...")
+            data = self.load_data()
+            if changed_urls is not None:
+                changed_urls = set(changed_urls)
+                reused_urls = {item.get("url", "") for item in data} - changed_urls
+                data = [item for item in data if item.get("url", "") in changed_urls]
+            docs = self.chunk_data(data)
+            docs = self.dedup(docs)
+            if docs:
+                self.create_pinecone_collection(docs, generation=generation)
+        
+            expected = {ns: len(ns_docs) for ns, ns_docs in self.group_by_namespace(docs, generation=generation).items()}
+            if changed_urls is not None:
+                for namespace, count in self.copy_generation_vectors(live, generation, reused_urls).items():
+                    expected[namespace] = expected.get(namespace, 0) + count
+            try:
+                self.validate_generation(generation, expected, smoke_questions=smoke_questions, timeout=timeout)
+            except RebuildValidationError:
+                self.delete_generation(generation)
+                raise
+        
+            state = self.alias.switch(generation)
+            print(f"Switched '{self.index_name}' to generation '{generation}' "
+                  f"(rollback target: '{state['previous'][0] or '(legacy)'}')")
+            self.garbage_collect_generations(keep_previous=keep_previous)
+            return generation
+
+    def rollback_generation(self):
+        """Point the alias back at the most recent previous generation"""
+        with ingestion_lock():
+            previous = self.alias.previous() if self.alias else []
+            counts = self.generation_counts()
+            target = next((generation for generation in previous if counts.get(generation)), None)
+            if target is None:
+                raise ValueError("No previous generation with vectors left to roll back to")
+            self.alias.switch(target)
+            print(f"Rolled '{self.index_name}' back to generation '{target or '(legacy)'}'")
+            return target
+
+    def garbage_collect_generations(self, keep_previous=DEFAULT_KEEP_PREVIOUS):
+        """Delete generations that are neither live nor among the last keep_previous"""
+        with ingestion_lock():
+            state = self.alias.state()
+            keep = {state["active"], *state["previous"][:keep_previous]}
+            stale = [generation for generation in self.generation_counts() if generation not in keep]
+            for generation in stale:
+                self.delete_generation(generation)
+            self.alias.forget(stale + state["previous"][keep_previous:])
+            return stale
+
     def delete_pinecone_collection(self):
         """Delete all vectors from Pinecone index"""
         try:
             # Get all vector IDs (this might be slow for large indexes)
             stats = self.index.describe_index_stats()
             if stats["total_vector_count"] > 0:
-                self.index.delete(delete_all=True)
+                # delete_all only clears one namespace at a time
+                for namespace in stats.get("namespaces", {}):
+                    self.index.delete(delete_all=True, namespace=namespace)
                 print(f"Deleted all vectors from Pinecone index '{self.index_name}'")
             else:
                 print("No vectors to delete from Pinecone index")
+            self._namespaces = None
         except Exception as e:
             print(f"Error deleting vectors: {e}")
 
@@ -0,0 +1,299 @@
+import random
+import re
+import threading
+import time
+
+import openai
+from openai import OpenAI
+
+from record_replay import CassetteMissError, openai_http_client
+from utils import count_tokens
+
+# OpenAI embeddings endpoint limits per request
+MAX_TOKENS_PER_REQUEST = 300_000
+MAX_INPUTS_PER_REQUEST = 2048
+
+# Default text-embedding-3-small quota; corrected from response headers once known
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_REQUESTS_PER_MINUTE = 3_000
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_reset_duration(value):
+    """Parse OpenAI reset headers like '20ms', '1s' or '6m0s' into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def pack_batches(token_counts, max_tokens=MAX_TOKENS_PER_REQUEST, max_inputs=MAX_INPUTS_PER_REQUEST):
+    """
+    Greedily pack consecutive inputs into requests that stay under both the
+    per-request token and input limits. Returns a list of (start, end) slices.
+    """
+    batches = []
+    start = 0
+    batch_tokens = 0
+    for i, tokens in enumerate(token_counts):
+        if i > start and (batch_tokens + tokens > max_tokens or i - start >= max_inputs):
+            batches.append((start, i))
+            start = i
+            batch_tokens = 0
+        batch_tokens += tokens
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+class TokenBucket:
+    """Per-minute budget that refills continuously, as OpenAI's limiter does"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        rate = self.capacity / 60.0
+        self.available = min(self.capacity, self.available + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        # A single request larger than the whole budget can only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / (self.capacity / 60.0)
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.available -= amount
+
+    def sync(self, limit=None, remaining=None, now=None):
+        """Adopt the server's view of the quota from rate-limit headers"""
+        now = now if now is not None else time.monotonic()
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.available = min(self.available, float(remaining))
+
+
+class EmbeddingScheduler:
+    """
+    Client-side governor for embedding calls.
+
+    Inputs are packed into requests by token count, each request waits until
+    both the tokens-per-minute and requests-per-minute buckets can cover it,
+    and the buckets are re-synced from the x-ratelimit-* headers of every
+    response. 429s and transient errors are retried after retry-after (or an
+    exponential backoff) instead of aborting the ingest.
+
+    embed_fn, when given, is called with each packed request's texts in
+    place of the OpenAI API (e.g. a stand-in backend's embed_documents).
+    """
+
+    def __init__(
+        self,
+        model="text-embedding-3-small",
+        client=None,
+        dimensions=None,
+        tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+        requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+        max_tokens_per_request=MAX_TOKENS_PER_REQUEST,
+        max_inputs_per_request=MAX_INPUTS_PER_REQUEST,
+        safety_margin=0.9,
+        max_retries=8,
+        embed_fn=None
+    ):
+        self.model = model
+        self._client = client
+        self.embed_fn = embed_fn
+        # Shortened output size for text-embedding-3 models (None: native)
+        self.dimensions = dimensions
+        # A request larger than the per-minute budget could never be paced under it
+        self.max_tokens_per_request = int(min(max_tokens_per_request, tokens_per_minute) * safety_margin)
+        self.max_inputs_per_request = max_inputs_per_request
+        self.safety_margin = safety_margin
+        self.max_retries = max_retries
+
+        self.token_bucket = TokenBucket(tokens_per_minute * safety_margin)
+        self.request_bucket = TokenBucket(requests_per_minute * safety_margin)
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.reset_metrics()
+
+    @property
+    def client(self):
+        # Created on first use so that handlers with stand-in backends never need an API key
+        if self._client is None:
+            # Retries are handled here so that 429s feed back into the limiter
+            self._client = OpenAI(max_retries=0, http_client=openai_http_client())
+        return self._client
+
+    def reset_metrics(self):
+        self.stats = {
+            "requests": 0,
+            "inputs": 0,
+            "tokens": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "throttle_seconds": 0.0,
+            "started": None,
+            "finished": None
+        }
+
+    def _acquire(self, tokens):
+        """Block until both buckets (and any server-imposed pause) allow the request"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(
+                    self._blocked_until - now,
+                    self.token_bucket.wait_time(tokens, now),
+                    self.request_bucket.wait_time(1, now)
+                )
+                if wait <= 0:
+                    self.token_bucket.consume(tokens, now)
+                    self.request_bucket.consume(1, now)
+                    return
+            self.stats["throttle_seconds"] += wait
+            time.sleep(wait)
+
+    def _sync_from_headers(self, headers):
+        if headers is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            limit_tokens = headers.get("x-ratelimit-limit-tokens")
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            limit_requests = headers.get("x-ratelimit-limit-requests")
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            self.token_bucket.sync(
+                limit=float(limit_tokens) * self.safety_margin if limit_tokens else None,
+                remaining=float(remaining_tokens) if remaining_tokens else None,
+                now=now
+            )
+            self.request_bucket.sync(
+                limit=float(limit_requests) * self.safety_margin if limit_requests else None,
+                remaining=float(remaining_requests) if remaining_requests else None,
+                now=now
+            )
+
+    def _retry_delay(self, headers, attempt):
+        if headers is not None:
+            retry_after_ms = headers.get("retry-after-ms")
+            if retry_after_ms:
+                return float(retry_after_ms) / 1000.0
+            retry_after = parse_reset_duration(headers.get("retry-after"))
+            if retry_after is not None:
+                return retry_after
+            reset = [parse_reset_duration(headers.get(h))
+                     for h in ("x-ratelimit-reset-tokens", "x-ratelimit-reset-requests")]
+            reset = [r for r in reset if r]
+            if reset:
+                return max(reset)
+        return min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+    def _request(self, texts, tokens):
+        if self.embed_fn is not None:
+            self._acquire(tokens)
+            embeddings = self.embed_fn(texts)
+            self.stats["requests"] += 1
+            self.stats["inputs"] += len(texts)
+            self.stats["tokens"] += tokens
+            return embeddings
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens)
+            try:
+                extra = {"dimensions": self.dimensions} if self.dimensions else {}
+                raw = self.client.embeddings.with_raw_response.create(model=self.model, input=texts, **extra)
+            except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt == self.max_retries or isinstance(e.__cause__, CassetteMissError):
+                    raise
+                response = getattr(e, "response", None)
+                headers = response.headers if response is not None else None
+                delay = self._retry_delay(headers, attempt)
+                self.stats["retries"] += 1
+                if isinstance(e, openai.RateLimitError):
+                    self.stats["rate_limited"] += 1
+                    self._sync_from_headers(headers)
+                    # Pause every caller, not just this one, until the server's window resets
+                    with self._lock:
+                        self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                    print(f"⏳ Rate limited; retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                else:
+                    print(f"⚠️ Embedding request failed ({e.__class__.__name__}); retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                continue
+
+            self._sync_from_headers(raw.headers)
+            response = raw.parse()
+            usage = getattr(response, "usage", None)
+            self.stats["requests"] += 1
+            self.stats["inputs"] += len(texts)
+            self.stats["tokens"] += usage.total_tokens if usage else tokens
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def embed_batches(self, texts):
+        """
+        Embed texts in token-packed requests, yielding (start, end, embeddings)
+        per request so callers can upsert as results arrive.
+        """
+        if self.stats["started"] is None:
+            self.stats["started"] = time.monotonic()
+        token_counts = [count_tokens(text) for text in texts]
+        for start, end in pack_batches(token_counts, self.max_tokens_per_request, self.max_inputs_per_request):
+            embeddings = self._request(texts[start:end], sum(token_counts[start:end]))
+            self.stats["finished"] = time.monotonic()
+            yield start, end, embeddings
+
+    def embed_documents(self, texts):
+        """Embed all texts, returning embeddings in input order"""
+        embeddings = []
+        for _, _, batch in self.embed_batches(texts):
+            embeddings.extend(batch)
+        return embeddings
+
+    def metrics(self):
+        """Throughput summary for everything embedded since the last reset"""
+        stats = dict(self.stats)
+        elapsed = 0.0
+        if stats["started"] is not None and stats["finished"] is not None:
+            elapsed = stats["finished"] - stats["started"]
+        minutes = elapsed / 60.0 if elapsed > 0 else None
+        return {
+            "requests": stats["requests"],
+            "inputs": stats["inputs"],
+            "tokens": stats["tokens"],
+            "retries": stats["retries"],
+            "rate_limited": stats["rate_limited"],
+            "throttle_seconds": round(stats["throttle_seconds"], 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "tokens_per_minute": round(stats["tokens"] / minutes) if minutes else None,
+            "requests_per_minute": round(stats["requests"] / minutes, 1) if minutes else None,
+            "tokens_per_minute_limit": round(self.token_bucket.capacity / self.safety_margin),
+            "requests_per_minute_limit": round(self.request_bucket.capacity / self.safety_margin)
+        }
+
+    def print_metrics(self):
+        m = self.metrics()
+        print(f"📈 Embedded {m['inputs']} chunks in {m['requests']} requests "
+              f"({m['tokens']:,} tokens, {m['elapsed_seconds']:.1f}s)")
+        if m["tokens_per_minute"] is not None:
+            print(f"   Throughput: {m['tokens_per_minute']:,} tokens/min of {m['tokens_per_minute_limit']:,}, "
+                  f"{m['requests_per_minute']} requests/min of {m['requests_per_minute_limit']:,}")
+        if m["retries"]:
+            print(f"   Retries: {m['retries']} ({m['rate_limited']} rate limited), "
+                  f"throttled for {m['throttle_seconds']:.1f}s")
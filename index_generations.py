@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Blue/green index generations behind an atomically switched alias.
+
+Every full rebuild writes into a fresh generation of namespaces
+("<generation>__<category>") alongside the live one. Once the new generation
+has been validated by vector count and smoke queries, the alias file that
+DataHandler reads is replaced in one os.replace, so queries move over without
+ever seeing an empty or half-built index. The previous generation is kept
+for rollback and older ones are garbage-collected.
+
+Namespaces without a generation prefix belong to the legacy generation ""
+that in-place builds wrote before aliases existed.
+
+Usage:
+    python index_generations.py status
+    python index_generations.py rebuild [--keep 1]
+    python index_generations.py rollback
+    python index_generations.py gc [--keep 1]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+ALIAS_DIR = os.getenv("INDEX_ALIAS_DIR", "output/index_aliases")
+GENERATION_SEPARATOR = "__"
+
+# Previous generations kept around for rollback after a switch
+DEFAULT_KEEP_PREVIOUS = 1
+
+# Held by whichever process builds, switches or garbage-collects generations
+# (refresh worker, CLI or app), so GC never deletes a generation mid-build
+INGESTION_LOCK_PATH = os.getenv("INGESTION_LOCK_PATH", "output/refresh.lock")
+
+
+class RebuildValidationError(RuntimeError):
+    """Raised when a freshly built generation fails validation and is not switched in"""
+
+
+class IngestionBusyError(RuntimeError):
+    """Raised when another process or thread already holds the ingestion lock"""
+
+
+_ingestion_thread_lock = threading.RLock()
+_ingestion_lock_files = {}
+
+
+@contextmanager
+def ingestion_lock(path=INGESTION_LOCK_PATH):
+    """
+    Cross-process lock around index ingestion, taken without waiting. The
+    flock is held once per process, so the thread holding it can re-enter
+    (a rebuild garbage-collects under the lock it was started with).
+    """
+    import fcntl
+
+    if not _ingestion_thread_lock.acquire(blocking=False):
+        raise IngestionBusyError("Another ingestion is running in this process")
+    try:
+        held = _ingestion_lock_files.get(path)
+        if held is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            lock_file = open(path, "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                raise IngestionBusyError(f"Another process holds the ingestion lock {path}") from None
+            held = _ingestion_lock_files[path] = [lock_file, 0]
+        held[1] += 1
+        try:
+            yield
+        finally:
+            held[1] -= 1
+            if held[1] == 0:
+                del _ingestion_lock_files[path]
+                held[0].close()
+    finally:
+        _ingestion_thread_lock.release()
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Write JSON to a temporary file and rename it over path, so readers never see a partial file"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def new_generation_id(taken=()):
+    """Timestamped generation name that doesn't collide with any in taken"""
+    base = "g" + time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    generation, n = base, 1
+    while generation in taken:
+        generation, n = f"{base}-{n}", n + 1
+    return generation
+
+
+def generation_namespace(generation, namespace):
+    """Namespace name of a category namespace within a generation"""
+    return f"{generation}{GENERATION_SEPARATOR}{namespace}" if generation else namespace
+
+
+def split_namespace(name):
+    """Inverse of generation_namespace: (generation, namespace)"""
+    generation, separator, namespace = name.partition(GENERATION_SEPARATOR)
+    return (generation, namespace) if separator else ("", name)
+
+
+class IndexAlias:
+    """
+    File-backed pointer to the live generation of one index.
+
+    Reads are a stat() per call and only re-parse the file after it changes,
+    so every query can afford to check it. Writes go to a temporary file that
+    replaces the alias in one atomic rename.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._state = {"active": "", "previous": []}
+
+    def state(self):
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                self._mtime = None
+                self._state = {"active": "", "previous": []}
+                return dict(self._state)
+            if mtime != self._mtime:
+                with open(self.path, "r") as f:
+                    self._state = json.load(f)
+                self._mtime = mtime
+            return dict(self._state)
+
+    def active(self):
+        return self.state()["active"]
+
+    def previous(self):
+        return list(self.state()["previous"])
+
+    def _write(self, state):
+        write_json_atomic(self.path, state)
+
+    def switch(self, generation):
+        """Make generation live, remembering the outgoing one for rollback"""
+        state = self.state()
+        if generation == state["active"]:
+            return state
+        previous = [state["active"]] + [g for g in state["previous"] if g not in (generation, state["active"])]
+        new_state = {
+            "active": generation,
+            "previous": previous,
+            "switched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        }
+        self._write(new_state)
+        return new_state
+
+    def restore(self, state):
+        """Overwrite the alias with a saved state, e.g. from a snapshot manifest"""
+        self._write({"active": state.get("active", ""), "previous": list(state.get("previous", [])),
+                     "switched_at": state.get("switched_at")})
+
+    def forget(self, generations):
+        """Drop garbage-collected generations from the rollback list"""
+        state = self.state()
+        remaining = [g for g in state["previous"] if g not in generations]
+        if remaining != state["previous"]:
+            state["previous"] = remaining
+            self._write(state)
+
+
+if __name__ == "__main__":
+    from data_handler import DataHandler
+
+    parser = argparse.ArgumentParser(description="Manage blue/green generations of the vector index")
+    parser.add_argument("command", choices=("status", "rebuild", "rollback", "gc"))
+    parser.add_argument("--index-name", help="Defaults to PINECONE_INDEX_NAME, else fidelity-financial-articles")
+    parser.add_argument("--data-path", default="output/fidelity_full_learning_center.json")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP_PREVIOUS,
+                        help="Previous generations to keep for rollback")
+    args = parser.parse_args()
+
+    handler = DataHandler(args.data_path, index_name=args.index_name)
+    try:
+        if args.command == "rebuild":
+            handler.rebuild_generation(keep_previous=args.keep)
+        elif args.command == "rollback":
+            handler.rollback_generation()
+        elif args.command == "gc":
+            handler.garbage_collect_generations(keep_previous=args.keep)
+    except IngestionBusyError as e:
+        raise SystemExit(f"⏭️ {e}; try again once it finishes")
+    if args.command == "status":
+        state = handler.alias.state()
+        counts = handler.generation_counts()
+        print(f"Live generation: {state['active'] or '(legacy)'}")
+        for generation, count in sorted(counts.items()):
+            marker = "*" if generation == state["active"] else " "
+            print(f" {marker} {generation or '(legacy)'}: {count} vectors")
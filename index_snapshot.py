@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Binary snapshots of the vector index, for restores that need no re-embedding.
+
+A snapshot is a directory holding:
+    manifest.json    format version, embedding model, dimension, metric,
+                     vector counts per namespace, the generation alias
+                     state and SHA-256 checksums
+    vectors.npy      all vectors as one contiguous float32 (N, dimension) array
+    records.parquet  chunk IDs, namespaces and metadata, one row per vector,
+                     in the same order as vectors.npy
+
+Usage:
+    python index_snapshot.py export output/snapshots/2025-01-01
+    python index_snapshot.py import output/snapshots/2025-01-01 [--index-name NAME] [--workers 16]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.parquet"
+
+# Pinecone caps fetch requests by ID count and URL length
+FETCH_BATCH_SIZE = 100
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot is corrupt or incompatible with the target index"""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_namespace_vectors(index, namespace):
+    """Yield batches of fetched vectors (with .id, .values, .metadata) for one namespace"""
+    for id_page in index.list(namespace=namespace):
+        for i in range(0, len(id_page), FETCH_BATCH_SIZE):
+            ids = id_page[i:i + FETCH_BATCH_SIZE]
+            fetched = index.fetch(ids=ids, namespace=namespace).vectors
+            batch = [fetched[vector_id] for vector_id in ids if vector_id in fetched]
+            if batch:
+                yield batch
+
+
+def _records_table(rows):
+    """
+    Table with a column for every metadata key in any row. from_pylist would
+    take its columns from the first row alone, silently dropping keys (e.g.
+    category) that only later namespaces' vectors carry.
+    """
+    columns = ["id", "namespace"]
+    seen = set(columns)
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    return pa.table({column: [row.get(column) for row in rows] for column in columns})
+
+
+def export_snapshot(index, path, model, dimension, metric="cosine", alias=None):
+    """
+    Write every vector in every namespace of index to a snapshot directory,
+    along with alias's state (which generation is live) if given.
+    """
+    start = time.perf_counter()
+    os.makedirs(path, exist_ok=True)
+
+    stats = index.describe_index_stats()
+    namespaces = sorted(stats.get("namespaces", {}).keys())
+
+    blocks = []
+    rows = []
+    counts = {}
+    for namespace in namespaces:
+        count = 0
+        for batch in iter_namespace_vectors(index, namespace):
+            blocks.append(np.asarray([vector.values for vector in batch], dtype=np.float32))
+            for vector in batch:
+                rows.append({"id": vector.id, "namespace": namespace, **(vector.metadata or {})})
+            count += len(batch)
+        counts[namespace] = count
+        print(f"  📦 {namespace or '(default)'}: {count} vectors")
+
+    vectors = np.vstack(blocks) if blocks else np.empty((0, dimension), dtype=np.float32)
+    if vectors.shape[1] != dimension:
+        raise SnapshotError(f"Index vectors have dimension {vectors.shape[1]}, expected {dimension}")
+
+    vectors_path = os.path.join(path, VECTORS_FILE)
+    records_path = os.path.join(path, RECORDS_FILE)
+    np.save(vectors_path, np.ascontiguousarray(vectors))
+    pq.write_table(_records_table(rows), records_path, compression="zstd")
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "model": model,
+        "dimension": dimension,
+        "metric": metric,
+        "dtype": "float32",
+        "vector_count": int(vectors.shape[0]),
+        "namespaces": counts,
+        "alias": alias.state() if alias is not None else None,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "checksums": {
+            VECTORS_FILE: _sha256(vectors_path),
+            RECORDS_FILE: _sha256(records_path)
+        }
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    size_mb = (os.path.getsize(vectors_path) + os.path.getsize(records_path)) / (1024 * 1024)
+    print(f"✅ Exported {manifest['vector_count']} vectors ({size_mb:.1f} MB) to {path} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return manifest
+
+
+def read_manifest(path):
+    """Load and sanity-check a snapshot's header without touching the data files"""
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise SnapshotError(f"No {MANIFEST_FILE} in {path}")
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format version {manifest.get('format_version')}")
+    return manifest
+
+
+def read_snapshot(path, verify=True):
+    """Load a snapshot's manifest, memory-mapped vectors and records, checking integrity"""
+    manifest = read_manifest(path)
+
+    if verify:
+        for filename, expected in manifest["checksums"].items():
+            if _sha256(os.path.join(path, filename)) != expected:
+                raise SnapshotError(f"Checksum mismatch for {filename}; snapshot is corrupt")
+
+    vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+    records = pq.read_table(os.path.join(path, RECORDS_FILE)).to_pylist()
+    if vectors.shape != (manifest["vector_count"], manifest["dimension"]) or len(records) != len(vectors):
+        raise SnapshotError("Snapshot vector and record counts disagree with the manifest")
+    return manifest, vectors, records
+
+
+def import_snapshot(index, path, model=None, dimension=None, batch_size=100, workers=16, verify=True,
+                    alias=None):
+    """
+    Bulk-load a snapshot into index with parallel upserts. model and
+    dimension, when given, must match the snapshot's header. If alias is
+    given, it is pointed at the generation that was live at export time once
+    every vector is loaded.
+    """
+    start = time.perf_counter()
+    manifest = read_manifest(path)
+    if model is not None and manifest["model"] != model:
+        raise SnapshotError(f"Snapshot was embedded with {manifest['model']}, target index uses {model}")
+    if dimension is not None and manifest["dimension"] != dimension:
+        raise SnapshotError(f"Snapshot dimension {manifest['dimension']} does not match target dimension {dimension}")
+
+    manifest, vectors, records = read_snapshot(path, verify=verify)
+
+    batches = []
+    batch_start = 0
+    for i in range(1, len(records) + 1):
+        # Records are grouped by namespace, so cut batches at namespace changes too
+        if i == len(records) or i - batch_start >= batch_size or records[i]["namespace"] != records[batch_start]["namespace"]:
+            batches.append((batch_start, i))
+            batch_start = i
+
+    def upsert(bounds):
+        lo, hi = bounds
+        namespace = records[lo]["namespace"]
+        payload = []
+        for record, values in zip(records[lo:hi], vectors[lo:hi]):
+            metadata = {k: v for k, v in record.items() if k not in ("id", "namespace") and v is not None}
+            payload.append({"id": record["id"], "values": values.tolist(), "metadata": metadata})
+        index.upsert(vectors=payload, namespace=namespace)
+        return hi - lo
+
+    loaded = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for count in pool.map(upsert, batches):
+            loaded += count
+
+    if alias is not None and manifest.get("alias"):
+        alias.restore(manifest["alias"])
+        print(f"🔀 Alias restored to generation '{manifest['alias']['active'] or 'legacy'}'")
+
+    print(f"✅ Restored {loaded} vectors into {len(manifest['namespaces'])} namespaces "
+          f"in {time.perf_counter() - start:.1f}s with zero embedding calls")
+    return loaded
+
+
+if __name__ == "__main__":
+    from data_handler import DataHandler, EMBEDDING_MODEL
+
+    parser = argparse.ArgumentParser(description="Export or import a binary snapshot of the vector index")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="Snapshot directory")
+    parser.add_argument("--index-name", help="Defaults to PINECONE_INDEX_NAME, else fidelity-financial-articles")
+    parser.add_argument("--workers", type=int, default=16, help="Parallel upsert requests during import")
+    parser.add_argument("--no-verify", action="store_true", help="Skip checksum verification on import")
+    args = parser.parse_args()
+
+    handler = DataHandler("output/fidelity_full_learning_center.json", index_name=args.index_name)
+    if args.command == "export":
+        export_snapshot(handler.index, args.path, EMBEDDING_MODEL, handler.embedding_dimension,
+                        alias=handler.alias)
+    else:
+        import_snapshot(handler.index, args.path, model=EMBEDDING_MODEL, dimension=handler.embedding_dimension,
+                        workers=args.workers, verify=not args.no_verify, alias=handler.alias)
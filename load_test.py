@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Concurrent multi-session load test for the chat pipeline.
+
+Simulates N chat sessions sending questions through utils.answer_question,
+the same code path app.py runs for every message, and reports throughput,
+per-stage latency percentiles, error rates and the saturation point.
+
+Usage:
+    python load_test.py --backend local --sessions 1,2,4,8,16 --duration 20
+    python load_test.py --backend local --backend-latency "completion=lognormal:900,0.4" --sessions 32
+    python load_test.py --backend local --arrival-rate 5 --sessions 8 --duration 60
+    CASSETTE_PATH=output/cassettes/pipeline.jsonl.gz python load_test.py --backend replay
+
+Backends:
+    local   in-memory index, hashed embeddings and a canned completion client
+            (measures our own code's overhead and concurrency limits)
+    replay  real clients served from a record/replay cassette (see record_replay.py)
+    live    real OpenAI and Pinecone (costs money)
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from answer_store import ANSWER_STORE_DIR, AnswerStore
+from data_handler import DataHandler
+from local_backends import build_local_backends
+from utils import ERROR_RESPONSE_PREFIX, EXAMPLE_QUESTIONS, answer_question, default_compressor
+
+DATA_PATH = "output/fidelity_full_learning_center.json"
+STAGES = ("queue", "answer_store", "retrieve", "compress", "build_prompt", "completion", "total")
+PERCENTILES = (50, 90, 95, 99)
+
+# A doubling of sessions that adds less throughput than this counts as saturated
+SATURATION_GAIN = 0.10
+
+
+def load_question_mix(data_path, seed=None):
+    """
+    Weighted question pool: the app's example questions are the most common,
+    followed by questions about individual article topics.
+    """
+    questions = [(question, 5.0) for _, question in EXAMPLE_QUESTIONS]
+    try:
+        with open(data_path, "r") as f:
+            articles = json.load(f)
+        templates = ["What should I know about {}?", "Can you explain {}?", "Give me tips on {}."]
+        rng = random.Random(seed)
+        for article in articles:
+            topic = article.get("title", "").strip().rstrip(".").lower()
+            if topic:
+                questions.append((rng.choice(templates).format(topic), 1.0))
+    except (OSError, ValueError):
+        pass
+    return questions
+
+
+class QuestionPicker:
+    def __init__(self, questions, seed=None):
+        self.questions = [q for q, _ in questions]
+        self.weights = [w for _, w in questions]
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def pick(self):
+        with self.lock:
+            return self.rng.choices(self.questions, weights=self.weights)[0]
+
+    def think_time(self, mean):
+        if mean <= 0:
+            return 0.0
+        with self.lock:
+            return self.rng.expovariate(1.0 / mean)
+
+    def interarrival(self, rate):
+        with self.lock:
+            return self.rng.expovariate(rate)
+
+
+class SessionFactory:
+    """
+    Builds one DataHandler and AnswerStore per simulated session, as app.py
+    does per Streamlit session
+    """
+
+    def __init__(self, backend, data_path, backend_latency, seed=None, store_dir=ANSWER_STORE_DIR):
+        self.backend = backend
+        self.data_path = data_path
+        self.store_dir = store_dir
+        self.completion_client = None
+        if backend == "local":
+            print("🧪 Building local stand-in backends...")
+            self.index, self.embeddings, self.completion_client = build_local_backends(
+                DataHandler, data_path, latency=backend_latency, seed=seed
+            )
+        elif backend == "replay" and not os.getenv("CASSETTE_PATH"):
+            raise SystemExit("❌ --backend replay needs CASSETTE_PATH pointing at a recorded cassette")
+
+    def create(self):
+        """(handler, answer_store) for one session"""
+        if self.backend == "local":
+            handler = DataHandler(self.data_path, index=self.index, embedding_function=self.embeddings, alias_dir=None)
+        else:
+            handler = DataHandler(self.data_path)
+        return handler, AnswerStore(handler, self.store_dir)
+
+
+def run_turn(handler, question, completion_client, answer_store=None):
+    """One timed chat turn; returns a result record"""
+    timings = {}
+
+    @contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    error = None
+    try:
+        response = answer_question(handler, question, stage=stage, completion_client=completion_client,
+                                   answer_store=answer_store)
+        if response.startswith(ERROR_RESPONSE_PREFIX):
+            error = response[len(ERROR_RESPONSE_PREFIX):].lstrip(": ")[:200]
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"[:200]
+    timings["total"] = time.perf_counter() - start
+    return {"timings": timings, "error": error}
+
+
+def run_level(factory, picker, sessions, duration, think_time, arrival_rate):
+    """Run one load level and return the per-request results plus wall time"""
+    session_backends = [factory.create() for _ in range(sessions)]
+    results = []
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def record(result):
+        with results_lock:
+            results.append(result)
+
+    if arrival_rate:
+        # Open loop: Poisson arrivals, served by a pool of session workers
+        free_backends = list(session_backends)
+        handler_lock = threading.Lock()
+
+        def serve(question, scheduled):
+            with handler_lock:
+                backends = free_backends.pop()
+            handler, store = backends
+            try:
+                queued = time.perf_counter() - scheduled
+                result = run_turn(handler, question, factory.completion_client, store)
+                result["timings"]["queue"] = queued
+                result["timings"]["total"] += queued
+                record(result)
+            finally:
+                with handler_lock:
+                    free_backends.append(backends)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            next_arrival = start
+            while next_arrival < deadline:
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(serve, picker.pick(), next_arrival)
+                next_arrival += picker.interarrival(arrival_rate)
+        elapsed = time.perf_counter() - start
+    else:
+        # Closed loop: each session asks, reads the answer, thinks, asks again
+        def session(handler, store):
+            while time.perf_counter() < deadline:
+                record(run_turn(handler, picker.pick(), factory.completion_client, store))
+                pause = min(picker.think_time(think_time), max(0.0, deadline - time.perf_counter()))
+                if pause:
+                    time.sleep(pause)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=session, args=b, daemon=True) for b in session_backends]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    return results, elapsed
+
+
+def summarize(results, elapsed, sessions):
+    """Throughput, error rate and latency percentiles (ms) per stage"""
+    errors = [r["error"] for r in results if r["error"]]
+    summary = {
+        "sessions": sessions,
+        "requests": len(results),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(results), 4) if results else 0.0,
+        "throughput_rps": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "elapsed_seconds": round(elapsed, 2),
+        "latency_ms": {},
+        "sample_errors": sorted(set(errors))[:5]
+    }
+    for name in STAGES:
+        values = np.array([r["timings"][name] for r in results if name in r["timings"]]) * 1000
+        if len(values) == 0:
+            continue
+        summary["latency_ms"][name] = {
+            "mean": round(float(values.mean()), 2),
+            **{f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+            "max": round(float(values.max()), 2)
+        }
+    return summary
+
+
+def find_saturation(levels):
+    """
+    First load level whose throughput gain over the previous level, per
+    doubling of sessions, drops below SATURATION_GAIN.
+    """
+    for previous, current in zip(levels, levels[1:]):
+        if previous["throughput_rps"] <= 0:
+            continue
+        doublings = np.log2(current["sessions"] / previous["sessions"]) or 1.0
+        gain = (current["throughput_rps"] / previous["throughput_rps"] - 1.0) / doublings
+        if gain < SATURATION_GAIN:
+            return {
+                "sessions": previous["sessions"],
+                "throughput_rps": previous["throughput_rps"],
+                "p95_total_ms": previous["latency_ms"].get("total", {}).get("p95")
+            }
+    return None
+
+
+def print_summary(summary):
+    print(f"\n👥 {summary['sessions']} sessions: {summary['requests']} requests in "
+          f"{summary['elapsed_seconds']}s → {summary['throughput_rps']} req/s, "
+          f"{summary['error_rate']:.1%} errors")
+    print(f"   {'stage':<13}" + "".join(f"{col:>10}" for col in ("mean", "p50", "p90", "p95", "p99", "max")))
+    for name, stats in summary["latency_ms"].items():
+        print(f"   {name:<13}" + "".join(f"{stats[col]:>10.1f}" for col in ("mean", "p50", "p90", "p95", "p99", "max")))
+    for error in summary["sample_errors"]:
+        print(f"   ❌ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the OnlyFinance chat pipeline")
+    parser.add_argument("--backend", choices=("local", "replay", "live"), default="local")
+    parser.add_argument("--sessions", default="1,2,4,8,16",
+                        help="Concurrent sessions, or a comma-separated sweep (default: 1,2,4,8,16)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per load level")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Mean think time between a session's questions, in seconds (exponential)")
+    parser.add_argument("--arrival-rate", type=float, default=None,
+                        help="Open-loop Poisson arrival rate in requests/second (sessions become the worker pool)")
+    parser.add_argument("--backend-latency", default="none",
+                        help='Stand-in latency for --backend local, e.g. "embedding=fixed:80;pinecone=lognormal:40,0.3;completion=lognormal:900,0.4"')
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the full JSON report here")
+    args = parser.parse_args()
+
+    levels = sorted({int(n) for n in args.sessions.split(",") if n.strip()})
+    factory = SessionFactory(args.backend, args.data_path, args.backend_latency, seed=args.seed)
+    picker = QuestionPicker(load_question_mix(args.data_path, seed=args.seed), seed=args.seed)
+
+    mode = f"open loop at {args.arrival_rate} req/s" if args.arrival_rate else f"closed loop, think time {args.think_time}s"
+    print(f"🚦 Load testing ({args.backend} backend, {mode}) at {levels} sessions, {args.duration}s each")
+
+    # Per-turn compression logging would swamp the report; the overall ratio is printed at the end
+    compressor = default_compressor()
+    if compressor:
+        compressor.verbose = False
+
+    summaries = []
+    for sessions in levels:
+        results, elapsed = run_level(factory, picker, sessions, args.duration, args.think_time, args.arrival_rate)
+        summary = summarize(results, elapsed, sessions)
+        print_summary(summary)
+        summaries.append(summary)
+
+    saturation = find_saturation(summaries)
+    print()
+    if saturation:
+        print(f"📉 Saturation at ~{saturation['sessions']} sessions: {saturation['throughput_rps']} req/s, "
+              f"p95 {saturation['p95_total_ms']} ms; more sessions only add latency")
+    elif len(summaries) > 1:
+        print("📈 Throughput still scaling at the highest level tested; try more sessions")
+
+    if compressor:
+        print(f"🗜️ Context compression kept {compressor.overall_ratio():.0%} of retrieved tokens")
+
+    if args.output:
+        report = {"config": vars(args), "levels": summaries, "saturation": saturation}
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import random
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+
+from record_replay import parse_latency, sample_latency_ms
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Stand-ins answer instantly unless a latency spec says otherwise
+DEFAULT_LATENCY = "none"
+
+
+class _Latency:
+    """Per-service latency sampling shared by the stand-in backends"""
+
+    def __init__(self, spec=DEFAULT_LATENCY, seed=None):
+        self.spec = parse_latency(spec)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self, service, extra_ms=0.0):
+        kind, params = self.spec.get(service, self.spec["*"])
+        if kind == "recorded":
+            kind, params = "none", ()
+        with self._lock:
+            ms = sample_latency_ms(kind, params, self._rng)
+        ms += extra_ms
+        if ms > 0:
+            time.sleep(ms / 1000.0)
+
+
+class LocalEmbeddings:
+    """
+    Deterministic stand-in for OpenAIEmbeddings: hashed bag-of-words vectors,
+    so that questions still retrieve chunks that share their vocabulary.
+    """
+
+    def __init__(self, dimension=1536, latency=None):
+        self.dimension = dimension
+        self.latency = latency or _Latency()
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            h = zlib.crc32(word.encode("utf-8"))
+            vector[h % self.dimension] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        self.latency.sleep("embedding")
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.latency.sleep("embedding")
+        return self._embed(text)
+
+
+class LocalIndex:
+    """In-memory stand-in for a Pinecone index (cosine metric, namespaces, metadata)"""
+
+    def __init__(self, dimension=1536, latency=None):
+        self.dimension = dimension
+        self.latency = latency or _Latency()
+        self._namespaces = {}
+        # Normalized (ids, matrix, metadata) per namespace, rebuilt after writes
+        self._matrices = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace="", **kwargs):
+        self.latency.sleep("pinecone")
+        with self._lock:
+            records = self._namespaces.setdefault(namespace, {})
+            for vector in vectors:
+                values = np.asarray(vector["values"], dtype=np.float32)
+                records[vector["id"]] = (values, vector.get("metadata", {}))
+            self._matrices = {}
+        return {"upserted_count": len(vectors)}
+
+    def _matrix(self, namespace):
+        with self._lock:
+            cached = self._matrices.get(namespace)
+            if cached is not None:
+                return cached
+            records = self._namespaces.get(namespace, {})
+            ids = list(records.keys())
+            matrix = np.stack([records[i][0] for i in ids]) if ids else np.empty((0, self.dimension), np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+            metadata = [records[i][1] for i in ids]
+            self._matrices[namespace] = (ids, matrix, metadata)
+            return self._matrices[namespace]
+
+    def _search(self, vector, top_k, namespace, include_values=False):
+        ids, matrix, metadata = self._matrix(namespace)
+        if not ids:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = matrix @ (query / norm if norm else query)
+        k = min(top_k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {
+                "id": ids[i],
+                "score": float(scores[i]),
+                "metadata": metadata[i],
+                "namespace": namespace,
+                **({"values": matrix[i].tolist()} if include_values else {})
+            }
+            for i in top
+        ]
+
+    def query(self, vector, top_k, namespace="", include_metadata=True, include_values=False, **kwargs):
+        self.latency.sleep("pinecone")
+        return {"matches": self._search(vector, top_k, namespace, include_values), "namespace": namespace}
+
+    def query_namespaces(self, vector, namespaces, metric="cosine", top_k=10, include_metadata=True,
+                         include_values=False, **kwargs):
+        self.latency.sleep("pinecone")
+        matches = []
+        for namespace in namespaces:
+            matches.extend(self._search(vector, top_k, namespace, include_values))
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        return {"matches": matches[:top_k]}
+
+    def list(self, namespace="", limit=100, **kwargs):
+        """Yield pages of vector IDs, like Index.list on serverless indexes"""
+        with self._lock:
+            ids = list(self._namespaces.get(namespace, {}).keys())
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def fetch(self, ids, namespace="", **kwargs):
+        self.latency.sleep("pinecone")
+        with self._lock:
+            records = self._namespaces.get(namespace, {})
+            vectors = {
+                vector_id: SimpleNamespace(id=vector_id, values=records[vector_id][0].tolist(),
+                                           metadata=records[vector_id][1])
+                for vector_id in ids if vector_id in records
+            }
+        return SimpleNamespace(namespace=namespace, vectors=vectors)
+
+    def describe_index_stats(self, **kwargs):
+        with self._lock:
+            namespaces = {ns: {"vector_count": len(records)} for ns, records in self._namespaces.items() if records}
+        return {
+            "dimension": self.dimension,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values()),
+            "namespaces": namespaces
+        }
+
+    def delete(self, ids=None, delete_all=False, namespace="", **kwargs):
+        self.latency.sleep("pinecone")
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+            elif ids:
+                records = self._namespaces.get(namespace, {})
+                for vector_id in ids:
+                    records.pop(vector_id, None)
+            self._matrices = {}
+        return {}
+
+
+class _LocalCompletions:
+    def __init__(self, latency, ms_per_output_token):
+        self.latency = latency
+        self.ms_per_output_token = ms_per_output_token
+
+    def create(self, model, messages, temperature=None, max_tokens=None, **kwargs):
+        prompt = messages[-1]["content"]
+        # Echo the first retrieved sentence so answers stay tied to the context
+        context = prompt.split("Content: ", 1)[1] if "Content: " in prompt else ""
+        first_sentence = context.split(".")[0].strip()[:300]
+        content = f"Here is what the Learning Center says: {first_sentence}." if first_sentence else \
+            "I don't have enough context to answer that, but here is some general guidance."
+        output_tokens = max(1, len(content) // 4)
+        self.latency.sleep("completion", extra_ms=output_tokens * self.ms_per_output_token)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                     message=SimpleNamespace(role="assistant", content=content))],
+            usage=SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=output_tokens,
+                                  total_tokens=len(prompt) // 4 + output_tokens)
+        )
+
+
+class LocalChatClient:
+    """Stand-in for the OpenAI client's chat.completions.create"""
+
+    def __init__(self, latency=None, ms_per_output_token=0.0):
+        self.chat = SimpleNamespace(completions=_LocalCompletions(latency or _Latency(), ms_per_output_token))
+
+
+def build_local_backends(data_handler_cls, data_path, latency=DEFAULT_LATENCY, seed=None, dimension=1536):
+    """
+    Build an in-memory index populated from data_path, plus the embedding and
+    completion stand-ins. Returns (index, embeddings, chat_client) so callers
+    can construct any number of handlers that share one index, the way app
+    sessions share one Pinecone index.
+    """
+    shared_latency = _Latency(latency, seed=seed)
+    embeddings = LocalEmbeddings(dimension=dimension, latency=_Latency("none"))
+    index = LocalIndex(dimension=dimension, latency=_Latency("none"))
+
+    # No alias: the stand-in index only ever holds the legacy generation
+    loader = data_handler_cls(data_path, index=index, embedding_function=embeddings, alias_dir=None,
+                              embedding_dimension=dimension)
+    docs = loader.chunk_data(loader.load_data())
+    for namespace, namespace_docs in loader.group_by_namespace(docs).items():
+        vectors = loader.build_vectors(namespace_docs, embeddings.embed_documents([d["text"] for d in namespace_docs]))
+        index.upsert(vectors=vectors, namespace=namespace)
+
+    # Latency only applies once loading is done
+    embeddings.latency = shared_latency
+    index.latency = shared_latency
+    return index, embeddings, LocalChatClient(latency=shared_latency)
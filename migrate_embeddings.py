@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Move the index to a different embedding dimension, and measure the trade-off.
+
+text-embedding-3 models are trained so that a prefix of each embedding is
+itself a usable embedding: asking the API for `dimensions=d` returns the
+first d components, re-normalized. That allows two migration modes:
+
+    reproject  truncate and re-normalize the vectors already stored in the
+               source index (no embedding calls)
+    reembed    chunk and embed the corpus again at the new dimension
+
+Either way the new vectors go into a separate index, since a Pinecone
+index's dimension is fixed. Once it is ready, set EMBEDDING_DIMENSION and
+PINECONE_INDEX_NAME together to serve it from the app, the refresh worker
+and the other CLIs.
+
+Usage:
+    python migrate_embeddings.py migrate --dimension 512 [--mode reembed] [--target-index NAME]
+    python migrate_embeddings.py benchmark --snapshot output/snapshots/latest --dims 256,512,1024,1536
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from data_handler import DEFAULT_INDEX_NAME, DataHandler, UPSERT_BATCH_SIZE
+from index_generations import generation_namespace, split_namespace
+from index_snapshot import iter_namespace_vectors, read_snapshot
+
+DATA_PATH = "output/fidelity_full_learning_center.json"
+
+
+def reproject(vectors, dimension):
+    """Shorten text-embedding-3 vectors the way the API does: keep a prefix, re-normalize"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dimension > vectors.shape[1]:
+        raise ValueError(f"Cannot reproject {vectors.shape[1]}-dimensional vectors up to {dimension}")
+    truncated = vectors[:, :dimension]
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    return truncated / np.where(norms == 0, 1, norms)
+
+
+def default_target_index(source_index, dimension):
+    return f"{source_index}-{dimension}d"
+
+
+def migrate_reproject(source, target, workers=8):
+    """
+    Copy the live generation of source's index into target's, reprojecting
+    every vector to target.embedding_dimension. Returns the vector count.
+    """
+    start = time.perf_counter()
+    target_generation = target.active_generation()
+
+    def copy(job):
+        namespace, batch = job
+        values = reproject([vector.values for vector in batch], target.embedding_dimension)
+        target.index.upsert(
+            vectors=[
+                {"id": vector.id, "values": row.tolist(), "metadata": vector.metadata or {}}
+                for vector, row in zip(batch, values)
+            ],
+            namespace=namespace
+        )
+        return len(batch)
+
+    copied = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for source_namespace in source.list_namespaces(refresh=True):
+            namespace = generation_namespace(target_generation, split_namespace(source_namespace)[1])
+            jobs = ((namespace, batch[i:i + UPSERT_BATCH_SIZE])
+                    for batch in iter_namespace_vectors(source.index, source_namespace)
+                    for i in range(0, len(batch), UPSERT_BATCH_SIZE))
+            count = sum(pool.map(copy, jobs))
+            print(f"  📐 {source_namespace} → {namespace}: {count} vectors")
+            copied += count
+
+    target._namespaces = None
+    print(f"✅ Reprojected {copied} vectors from {source.embedding_dimension} to {target.embedding_dimension} "
+          f"dimensions in {time.perf_counter() - start:.1f}s with zero embedding calls")
+    return copied
+
+
+def benchmark_dimensions(vectors, dimensions, k=5, num_queries=200, query_vectors=None, seed=42):
+    """
+    Recall@k of shortened embeddings against the full-dimension ranking, plus
+    search latency and index size per dimension.
+
+    Queries are a sample of the stored chunk vectors (each chunk's nearest
+    other chunks), plus query_vectors (e.g. embedded user questions) if given.
+    """
+    full = reproject(vectors, vectors.shape[1])
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(full), size=min(num_queries, len(full)), replace=False)
+
+    query_sets = {"chunks": (full[sample], sample)}
+    if query_vectors is not None and len(query_vectors):
+        query_sets["questions"] = (reproject(query_vectors, vectors.shape[1]), None)
+
+    truths = {}
+    for name, (queries, self_ids) in query_sets.items():
+        truths[name] = _top_k_excluding(full, queries, k, self_ids)
+
+    rows = []
+    for dimension in dimensions:
+        matrix = reproject(full, dimension)
+        row = {
+            "dimension": dimension,
+            "index_mb": round(matrix.nbytes / (1024 * 1024), 2),
+            "bytes_per_vector": dimension * 4
+        }
+        for name, (queries, self_ids) in query_sets.items():
+            shortened = reproject(queries, dimension)
+            timings = []
+            for i in range(len(shortened)):
+                t0 = time.perf_counter()
+                _top_k_excluding(matrix, shortened[i:i + 1], k, None if self_ids is None else self_ids[i:i + 1])
+                timings.append(time.perf_counter() - t0)
+            found = _top_k_excluding(matrix, shortened, k, self_ids)
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truths[name])])
+            row[f"recall_{name}"] = round(float(recall), 4)
+            row[f"search_us_{name}"] = round(float(np.median(timings)) * 1e6, 1)
+        rows.append(row)
+    return rows
+
+
+def _top_k_excluding(matrix, queries, k, self_ids):
+    """Brute-force cosine top-k per query row, skipping each query's own row when self_ids is given"""
+    scores = queries @ matrix.T
+    if self_ids is not None:
+        scores[np.arange(len(queries)), self_ids] = -np.inf
+    k = min(k, matrix.shape[0] - (1 if self_ids is not None else 0))
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def print_benchmark(rows, k):
+    names = [key[len("recall_"):] for key in rows[0] if key.startswith("recall_")]
+    header = f"{'dim':>6}{'index MB':>10}{'bytes/vec':>11}"
+    for name in names:
+        header += f"{f'recall@{k} {name}':>20}{f'search µs':>11}"
+    print(header)
+    for row in rows:
+        line = f"{row['dimension']:>6}{row['index_mb']:>10.2f}{row['bytes_per_vector']:>11}"
+        for name in names:
+            line += f"{row[f'recall_{name}']:>20.3f}{row[f'search_us_{name}']:>11.1f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the index to another embedding dimension, or benchmark dimensions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate", help="Build an index at a new dimension")
+    migrate.add_argument("--dimension", type=int, required=True)
+    migrate.add_argument("--mode", choices=("reproject", "reembed"), default="reproject")
+    migrate.add_argument("--source-index", help="Defaults to PINECONE_INDEX_NAME, else fidelity-financial-articles")
+    migrate.add_argument("--source-dimension", type=int, help="Defaults to EMBEDDING_DIMENSION, else 1536")
+    migrate.add_argument("--target-index", help="Defaults to <source-index>-<dimension>d")
+    migrate.add_argument("--data-path", default=DATA_PATH)
+    migrate.add_argument("--workers", type=int, default=8)
+
+    bench = subparsers.add_parser("benchmark", help="Compare recall, latency and size across dimensions")
+    bench.add_argument("--snapshot", help="Snapshot of full-dimension vectors (default: read the live index)")
+    bench.add_argument("--source-index", help="Defaults to PINECONE_INDEX_NAME, else fidelity-financial-articles")
+    bench.add_argument("--dims", default="256,512,1024,1536")
+    bench.add_argument("--k", type=int, default=5)
+    bench.add_argument("--queries", type=int, default=200, help="Chunk vectors sampled as queries")
+    bench.add_argument("--questions", action="store_true",
+                       help="Also embed the app's example questions (OpenAI API) and use them as queries")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        source_index = args.source_index or os.getenv("PINECONE_INDEX_NAME", DEFAULT_INDEX_NAME)
+        target_index = args.target_index or default_target_index(source_index, args.dimension)
+        target = DataHandler(args.data_path, index_name=target_index, embedding_dimension=args.dimension)
+        if args.mode == "reembed":
+            target.process_data_and_create_collection()
+        else:
+            source = DataHandler(args.data_path, index_name=source_index, embedding_dimension=args.source_dimension)
+            migrate_reproject(source, target, workers=args.workers)
+        print(f"👉 Serve it by setting EMBEDDING_DIMENSION={args.dimension} and PINECONE_INDEX_NAME={target_index} "
+              f"for the app, the refresh worker and the CLIs")
+        return
+
+    if args.snapshot:
+        _, vectors, _ = read_snapshot(args.snapshot)
+        vectors = np.asarray(vectors)
+    else:
+        source = DataHandler(DATA_PATH, index_name=args.source_index)
+        vectors = np.vstack([
+            np.asarray([vector.values for vector in batch], dtype=np.float32)
+            for namespace in source.list_namespaces(refresh=True)
+            for batch in iter_namespace_vectors(source.index, namespace)
+        ])
+
+    query_vectors = None
+    if args.questions:
+        from langchain_openai import OpenAIEmbeddings
+        from data_handler import EMBEDDING_MODEL
+        from record_replay import openai_http_client
+        from utils import EXAMPLE_QUESTIONS
+        embedder = OpenAIEmbeddings(model=EMBEDDING_MODEL, http_client=openai_http_client())
+        query_vectors = np.asarray(embedder.embed_documents([q for _, q in EXAMPLE_QUESTIONS]), dtype=np.float32)
+
+    dimensions = [d for d in sorted({int(d) for d in args.dims.split(",")}) if d <= vectors.shape[1]]
+    print(f"📏 Benchmarking {len(vectors)} vectors of dimension {vectors.shape[1]} at {dimensions}")
+    print_benchmark(benchmark_dimensions(vectors, dimensions, k=args.k, num_queries=args.queries,
+                                         query_vectors=query_vectors), args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Transport-level record/replay for OpenAI and Pinecone calls.
+
+Record real embedding, query and completion responses once into a cassette,
+then replay them offline with simulated latency for reproducible load and
+performance tests.
+
+Activate from the environment (picked up the first time a client is built):
+
+    CASSETTE_PATH=output/cassettes/pipeline.jsonl.gz
+    CASSETTE_MODE=record|replay          (default: replay)
+    CASSETTE_STRICT=1                    fail on requests missing from the cassette
+    CASSETTE_LATENCY=recorded            or none, fixed:MS, normal:MEAN,STD,
+                                         lognormal:MEDIAN,SIGMA, uniform:LOW,HIGH
+                                         optionally per service:
+                                         "openai=lognormal:400,0.5;pinecone=fixed:30"
+
+or programmatically with activate(path, mode=..., strict=..., latency=...).
+
+OpenAI traffic is intercepted by an httpx transport passed to every client
+via openai_http_client(); Pinecone traffic by wrapping the SDK's urllib3
+REST client; activation fails with CassetteHookError rather than letting
+Pinecone calls go live if an SDK upgrade moves that client. Replay on an
+isolated box still needs tiktoken's encoding file in TIKTOKEN_CACHE_DIR,
+since LangChain tokenizes embedding inputs locally.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+import httpx
+
+MODES = ("record", "replay")
+
+# Only headers that affect client behaviour are worth keeping
+KEPT_HEADERS = ("content-type", "retry-after", "retry-after-ms")
+KEPT_HEADER_PREFIXES = ("x-ratelimit-",)
+DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in strict replay mode for a request that was never recorded"""
+
+
+class CassetteHookError(RuntimeError):
+    """Raised when Pinecone is installed but its REST client can't be intercepted"""
+
+
+def parse_latency(spec):
+    """
+    Parse a latency spec into {service: (kind, params)}; the "*" entry
+    applies to services without their own spec.
+    """
+    spec = (spec or "recorded").strip()
+    parsed = {}
+    for part in spec.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        service = "*"
+        if "=" in part:
+            service, part = part.split("=", 1)
+        kind, _, params = part.partition(":")
+        kind = kind.strip().lower()
+        if kind not in ("recorded", "none", "fixed", "normal", "lognormal", "uniform"):
+            raise ValueError(f"Unknown latency distribution '{kind}'")
+        values = tuple(float(v) for v in params.split(",")) if params else ()
+        parsed[service.strip()] = (kind, values)
+    parsed.setdefault("*", ("recorded", ()))
+    return parsed
+
+
+def sample_latency_ms(kind, params, rng, recorded_ms=0.0):
+    """Draw one latency in milliseconds from a parsed distribution"""
+    if kind == "recorded":
+        ms = recorded_ms
+    elif kind == "none":
+        ms = 0.0
+    elif kind == "fixed":
+        ms = params[0]
+    elif kind == "normal":
+        ms = rng.gauss(params[0], params[1])
+    elif kind == "lognormal":
+        # Parameterized by median so that specs read like observed latencies
+        ms = params[0] * rng.lognormvariate(0.0, params[1])
+    else:
+        ms = rng.uniform(params[0], params[1])
+    return max(0.0, ms)
+
+
+def _canonical_body(service, method, path, body):
+    """Stable request body for keying, with volatile fields replaced"""
+    if body is None or body == b"":
+        return None
+    if isinstance(body, (bytes, bytearray)):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            return hashlib.sha256(body).hexdigest()
+
+    if service == "pinecone" and isinstance(body, dict):
+        # Chunk IDs are random UUIDs, so key writes by shape rather than content
+        if path.endswith("/vectors/upsert"):
+            return {"namespace": body.get("namespace", ""), "count": len(body.get("vectors", []))}
+        if path.endswith("/vectors/delete") and "ids" in body:
+            return dict(body, ids=len(body["ids"]))
+    return body
+
+
+def request_key(service, method, url, body=None):
+    """Hash of everything that identifies a request for replay purposes"""
+    parsed = urlparse(url)
+    canonical = {
+        "service": service,
+        "method": method.upper(),
+        "host": parsed.netloc,
+        "path": parsed.path,
+        "query": parsed.query,
+        "body": _canonical_body(service, method, parsed.path, body)
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _filter_headers(headers):
+    kept = {}
+    for name, value in dict(headers or {}).items():
+        lower = name.lower()
+        if lower in KEPT_HEADERS or lower.startswith(KEPT_HEADER_PREFIXES):
+            kept[lower] = value
+    return kept
+
+
+class Cassette:
+    """
+    Append-only, gzip-compressed JSONL store of recorded responses.
+
+    Each request key maps to one or more recorded responses; replay cycles
+    through them so repeated identical requests (e.g. sampled completions)
+    keep their variety.
+    """
+
+    def __init__(self, path, mode="replay", strict=False, latency="recorded", seed=None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self.strict = strict
+        self.latency = parse_latency(latency) if isinstance(latency, str) or latency is None else latency
+        self.entries = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Truncated tail from an interrupted recording
+                    continue
+                self.entries.setdefault(entry["key"], []).append(entry)
+
+    def __len__(self):
+        return sum(len(v) for v in self.entries.values())
+
+    def lookup(self, key):
+        with self._lock:
+            recorded = self.entries.get(key)
+            if not recorded:
+                self.stats["misses"] += 1
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            self.stats["hits"] += 1
+            return recorded[index % len(recorded)]
+
+    def miss(self, service, method, url):
+        message = f"Unrecorded {service} request: {method} {url}"
+        if self.strict:
+            raise CassetteMissError(message)
+        print(f"⚠️ {message} (passing through to the live service)")
+
+    def record(self, key, service, method, url, status, headers, body, latency_ms):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        entry = {
+            "key": key,
+            "service": service,
+            "method": method,
+            "path": urlparse(url).path,
+            "status": status,
+            "headers": _filter_headers(headers),
+            "body": base64.b64encode(gzip.compress(body or b"")).decode("ascii"),
+            "latency_ms": round(latency_ms, 2)
+        }
+        with self._lock:
+            self.entries.setdefault(key, []).append(entry)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Each append is its own gzip member, which gzip.open reads back transparently
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.stats["recorded"] += 1
+
+    @staticmethod
+    def body_of(entry):
+        return gzip.decompress(base64.b64decode(entry["body"]))
+
+    def delay_seconds(self, service, entry):
+        kind, params = self.latency.get(service, self.latency["*"])
+        return sample_latency_ms(kind, params, self._rng, entry.get("latency_ms", 0.0)) / 1000.0
+
+    def wait(self, service, entry):
+        delay = self.delay_seconds(service, entry)
+        if delay:
+            time.sleep(delay)
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport that records or replays OpenAI API traffic"""
+
+    def __init__(self, cassette, wrapped=None):
+        self.cassette = cassette
+        self.wrapped = wrapped
+
+    def _live(self):
+        if self.wrapped is None:
+            self.wrapped = httpx.HTTPTransport()
+        return self.wrapped
+
+    def handle_request(self, request):
+        body = request.read()
+        url = str(request.url)
+        key = request_key("openai", request.method, url, body)
+
+        if self.cassette.mode == "replay":
+            entry = self.cassette.lookup(key)
+            if entry is not None:
+                self.cassette.wait("openai", entry)
+                return httpx.Response(
+                    entry["status"],
+                    headers=entry["headers"],
+                    content=Cassette.body_of(entry),
+                    request=request
+                )
+            self.cassette.miss("openai", request.method, url)
+
+        start = time.perf_counter()
+        response = self._live().handle_request(request)
+        content = response.read()
+        latency_ms = (time.perf_counter() - start) * 1000
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS]
+
+        # Rate limits and server errors are transient, not part of the workload
+        if self.cassette.mode == "record" and response.status_code != 429 and response.status_code < 500:
+            self.cassette.record(key, "openai", request.method, url, response.status_code,
+                                 response.headers, content, latency_ms)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    def close(self):
+        if self.wrapped is not None:
+            self.wrapped.close()
+
+
+_active = None
+_env_checked = False
+_pinecone_hooked = False
+_state_lock = threading.Lock()
+
+
+def activate(path, mode="replay", strict=False, latency="recorded", seed=None):
+    """Start recording or replaying OpenAI and Pinecone traffic for this process"""
+    global _active
+    cassette = Cassette(path, mode=mode, strict=strict, latency=latency, seed=seed)
+    # Before activating, so a failed hook never leaves Pinecone calls silently going live
+    _install_pinecone_hook()
+    with _state_lock:
+        _active = cassette
+    if mode == "replay":
+        # Clients refuse to start without keys even though none are sent anywhere
+        os.environ.setdefault("OPENAI_API_KEY", "replay")
+        os.environ.setdefault("PINECONE_API_KEY", "replay")
+    print(f"📼 Cassette {mode} mode: {path} ({len(cassette)} recorded responses)")
+    return cassette
+
+
+def deactivate():
+    global _active
+    with _state_lock:
+        _active = None
+
+
+def active_cassette():
+    """The active cassette, activating one from CASSETTE_* env vars on first use"""
+    global _env_checked
+    if _active is None and not _env_checked:
+        _env_checked = True
+        path = os.getenv("CASSETTE_PATH")
+        if path:
+            activate(
+                path,
+                mode=os.getenv("CASSETTE_MODE", "replay"),
+                strict=os.getenv("CASSETTE_STRICT", "").lower() in ("1", "true", "yes"),
+                latency=os.getenv("CASSETTE_LATENCY", "recorded")
+            )
+    return _active
+
+
+def openai_http_client():
+    """httpx client for OpenAI SDK clients, or None to use the SDK default"""
+    cassette = active_cassette()
+    if cassette is None:
+        return None
+    return httpx.Client(transport=CassetteTransport(cassette), timeout=httpx.Timeout(600.0, connect=5.0))
+
+
+def _install_pinecone_hook():
+    """Wrap the Pinecone SDK's REST client so every data and control plane call goes through the cassette"""
+    global _pinecone_hooked
+    with _state_lock:
+        if _pinecone_hooked:
+            return
+        try:
+            import pinecone  # noqa: F401
+        except ImportError:
+            # No Pinecone client, so no Pinecone traffic to intercept
+            return
+        try:
+            from pinecone.openapi_support.rest_urllib3 import Urllib3RestClient
+            from pinecone.openapi_support.rest_utils import RESTResponse, raise_exceptions_or_return
+            from pinecone.openapi_support.exceptions import PineconeApiException
+            original_request = Urllib3RestClient.request
+        except (ImportError, AttributeError) as e:
+            raise CassetteHookError(
+                f"Can't intercept Pinecone calls: pinecone.openapi_support.rest_urllib3.Urllib3RestClient.request "
+                f"is missing from this Pinecone SDK ({e}); pin a supported version or update record_replay"
+            ) from e
+
+        def request(self, method, url, query_params=None, headers=None, body=None,
+                    post_params=None, _preload_content=True, _request_timeout=None):
+            cassette = _active
+            if cassette is None:
+                return original_request(self, method, url, query_params, headers, body,
+                                        post_params, _preload_content, _request_timeout)
+
+            full_url = url + ("?" + urlencode(sorted(query_params)) if query_params else "")
+            key = request_key("pinecone", method, full_url, body)
+
+            if cassette.mode == "replay":
+                entry = cassette.lookup(key)
+                if entry is not None:
+                    cassette.wait("pinecone", entry)
+                    response = RESTResponse(entry["status"], Cassette.body_of(entry), entry["headers"])
+                    return raise_exceptions_or_return(response)
+                cassette.miss("pinecone", method, full_url)
+
+            start = time.perf_counter()
+            try:
+                response = original_request(self, method, url, query_params, headers, body,
+                                            post_params, True, _request_timeout)
+                status, data, response_headers = response.status, response.data, response.headers
+                error = None
+            except PineconeApiException as e:
+                # Expected errors such as describe_index 404s drive control flow, so keep them
+                status, data, response_headers = e.status, e.body or b"", e.headers
+                error = e
+            latency_ms = (time.perf_counter() - start) * 1000
+
+            if cassette.mode == "record" and status and status != 429 and status < 500:
+                cassette.record(key, "pinecone", method, full_url, status, response_headers, data, latency_ms)
+            if error is not None:
+                raise error
+            return response
+
+        Urllib3RestClient.request = request
+        _pinecone_hooked = True
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Scheduled corpus refresh, run as its own process next to the app.
+
+Every cycle crawls the Learning Center, diffs the result against the current
+corpus, and, if anything changed, chunks and embeds only the added or
+changed articles into a new blue/green index generation (unchanged vectors
+are copied across) that is validated and switched in. The app never does
+this work: it reads the small status file this worker keeps up to date, and
+asks for full rebuilds (first start on an empty index, "Recreate
+collection") by dropping a request file that the worker picks up between
+cycles.
+
+The worker runs at low CPU priority, optionally pinned to a few cores, with
+single-threaded numeric libraries and its own embedding rate budget, and a
+lock file ensures only one refresh runs at a time.
+
+Usage:
+    python refresh_worker.py --interval 24h
+    python refresh_worker.py --once --max-pages 50
+    python refresh_worker.py --once --rebuild
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+
+from crawl_frontier import CrawlFrontier, normalize_url
+from index_generations import INGESTION_LOCK_PATH, IngestionBusyError, ingestion_lock, write_json_atomic
+
+DATA_PATH = "output/fidelity_full_learning_center.json"
+STATUS_PATH = os.getenv("REFRESH_STATUS_PATH", "output/refresh_status.json")
+# Shared with rebuilds and garbage collection run from the CLI or the app
+LOCK_PATH = INGESTION_LOCK_PATH
+# Keeps two workers from crawling into the same checkpoint, without blocking ingestion
+CRAWL_LOCK_PATH = os.getenv("REFRESH_CRAWL_LOCK_PATH", "output/refresh_crawl.lock")
+REFRESH_CHECKPOINT_DIR = "output/refresh_checkpoint"
+REQUEST_PATH = os.getenv("REFRESH_REQUEST_PATH", "output/refresh_request.json")
+
+# How often a sleeping worker checks for a rebuild request
+REQUEST_POLL_SECONDS = 5
+
+# Worker states in which it is busy with ingestion
+BUSY_STATES = ("crawling", "diffing", "embedding", "rebuilding", "warming")
+
+# A crawl returning fewer articles than this share of the current corpus is
+# treated as a failed crawl (site down, layout change) rather than deletions
+MIN_CORPUS_RATIO = 0.5
+
+_INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+_status_cache = {"mtime": None, "status": None}
+
+
+def parse_interval(value):
+    """Seconds from '90', '30m', '6h' or '1d'"""
+    value = str(value).strip().lower()
+    if value and value[-1] in _INTERVAL_UNITS:
+        return float(value[:-1]) * _INTERVAL_UNITS[value[-1]]
+    return float(value)
+
+
+def read_status(path=STATUS_PATH):
+    """Latest worker status, re-read only when the file changes (cheap enough for every app rerun)"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if mtime != _status_cache["mtime"]:
+        try:
+            with open(path, "r") as f:
+                _status_cache["status"] = json.load(f)
+            _status_cache["mtime"] = mtime
+        except (OSError, ValueError):
+            return _status_cache["status"]
+    return _status_cache["status"]
+
+
+def worker_running(status):
+    """True if the process that wrote status is still alive on this host"""
+    pid = (status or {}).get("pid")
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def request_rebuild(reason, path=REQUEST_PATH):
+    """Ask the worker for a full rebuild from the current corpus file; False if one is already queued"""
+    if os.path.exists(path):
+        return False
+    write_json_atomic(path, {"action": "rebuild", "reason": reason, "requested_at": time.time()})
+    return True
+
+
+def pending_request(path=REQUEST_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        # Unreadable requests would otherwise block every later one
+        os.remove(path)
+        return None
+
+
+def _article_hash(article):
+    content = "\x1f".join(str(article.get(key, "")) for key in ("title", "content", "category"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def diff_corpus(old_articles, new_articles):
+    """Added, changed and removed article URLs between two corpus versions"""
+    old = {article.get("url", ""): _article_hash(article) for article in old_articles}
+    new = {article.get("url", ""): _article_hash(article) for article in new_articles}
+    return {
+        "added": sorted(url for url in new if url not in old),
+        "changed": sorted(url for url in new if url in old and new[url] != old[url]),
+        "removed": sorted(url for url in old if url not in new)
+    }
+
+
+def keep_unfetched(old_articles, new_articles, unfetched_urls):
+    """
+    new_articles plus the old version of every article whose page could not
+    be fetched, so a failed fetch is not mistaken for a deletion
+    """
+    unfetched = {normalize_url(url) for url in unfetched_urls}
+    crawled = {normalize_url(article.get("url", "")) for article in new_articles}
+    kept = [article for article in old_articles
+            if normalize_url(article.get("url", "")) in unfetched - crawled]
+    if kept:
+        print(f"⚠️ Keeping {len(kept)} articles whose pages could not be fetched")
+    return list(new_articles) + kept
+
+
+def limit_resources(nice=10, cpus=None):
+    """Lower this process's priority and optionally pin it to the first `cpus` cores"""
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, set(available[:cpus]))
+    # Has to happen before numpy is imported to take effect
+    for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(variable, "1")
+
+
+class RefreshWorker:
+    def __init__(self, data_path=DATA_PATH, index_name=None, status_path=STATUS_PATH,
+                 max_depth=2, max_pages=None, keep_previous=1, request_path=REQUEST_PATH):
+        self.data_path = data_path
+        self.index_name = index_name
+        self.status_path = status_path
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.keep_previous = keep_previous
+        self.request_path = request_path
+        self.status = read_status(status_path) or {}
+
+    def set_status(self, **fields):
+        self.status.update(fields, pid=os.getpid(), updated_at=time.time())
+        write_json_atomic(self.status_path, self.status)
+
+    def _load_corpus(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def crawl(self, resume=False):
+        """
+        Returns (articles, complete, unfetched): an incomplete crawl is resumed
+        next cycle, and unfetched lists the URLs given up on after repeated
+        fetch failures
+        """
+        from scraper_full_learning_center import scrape_all_learning_center_articles
+        articles = scrape_all_learning_center_articles(
+            max_depth=self.max_depth,
+            checkpoint_dir=REFRESH_CHECKPOINT_DIR,
+            max_pages=self.max_pages,
+            resume=resume
+        )
+        with CrawlFrontier(REFRESH_CHECKPOINT_DIR, max_depth=self.max_depth) as frontier:
+            return articles, not frontier.has_pending(), list(frontier.given_up)
+
+    def make_handler(self, data_path):
+        from data_handler import DataHandler
+        return DataHandler(data_path, index_name=self.index_name)
+
+    @property
+    def staged_path(self):
+        return f"{self.data_path}.staged"
+
+    def run_once(self):
+        """
+        One crawl → diff → chunk → embed → upsert cycle. Returns the final status.
+
+        The crawl runs without the ingestion lock (it can take hours) and
+        leaves its result in the staged corpus; only diffing, ingesting and
+        switching hold the lock. A cycle that finds the lock busy keeps the
+        staged corpus and ingests it next cycle without crawling again.
+        """
+        started = time.time()
+        if self.status.get("state") == "staged" and os.path.exists(self.staged_path):
+            print("📦 Ingesting the corpus staged by the previous cycle")
+        else:
+            try:
+                with ingestion_lock(CRAWL_LOCK_PATH):
+                    if not self._crawl_to_staged(started):
+                        return self.status
+            except IngestionBusyError:
+                print("⏭️ Another refresh is already crawling; skipping this cycle")
+                return self.status
+            except Exception as e:
+                return self._failed(e)
+
+        try:
+            with ingestion_lock(LOCK_PATH):
+                return self._ingest_staged(started)
+        except IngestionBusyError:
+            print("⏭️ Another refresh or rebuild is running; the crawled corpus stays staged for the next cycle")
+            return self.status
+
+    def _crawl_to_staged(self, started):
+        """Crawl into the staged corpus file. Returns False if the crawl is incomplete."""
+        # Pick up an interrupted crawl, otherwise start from the landing page again
+        resume = self.status.get("state") == "crawling" or bool(self.status.get("crawl_incomplete"))
+        self.set_status(state="crawling", started_at=started, finished_at=None, error=None)
+        articles, complete, unfetched = self.crawl(resume=resume)
+        if not complete:
+            # Pages missing from a partial crawl would look like deletions
+            print("⏸️ Crawl stopped early; it will resume next cycle before anything is ingested")
+            self.set_status(finished_at=time.time(), articles=len(articles))
+            return False
+        write_json_atomic(self.staged_path, articles, ensure_ascii=False)
+        self.set_status(state="staged", articles=len(articles), unfetched=unfetched)
+        return True
+
+    def _ingest_staged(self, started):
+        """Diff the staged corpus against the current one and ingest it, with the ingestion lock held"""
+        try:
+            self.set_status(state="diffing")
+            articles = self._load_corpus(self.staged_path)
+            current = self._load_corpus(self.data_path)
+            if current and len(articles) < MIN_CORPUS_RATIO * len(current):
+                raise RuntimeError(f"Crawl returned {len(articles)} articles against {len(current)} "
+                                   f"in the current corpus; keeping the current corpus")
+            articles = keep_unfetched(current, articles, self.status.get("unfetched", ()))
+            changes = diff_corpus(current, articles)
+            counts = {kind: len(urls) for kind, urls in changes.items()}
+            print(f"🔍 Corpus diff: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed")
+
+            if any(counts.values()):
+                self.status["generation"] = self.ingest(articles, changes)
+            elif os.path.exists(self.staged_path):
+                os.remove(self.staged_path)
+            self.set_status(state="idle", finished_at=time.time(), last_success=time.time(),
+                            changes=counts, articles=len(articles), crawl_incomplete=False,
+                            duration_seconds=round(time.time() - started, 1))
+        except Exception as e:
+            return self._failed(e)
+
+        self._warm_after_ingest()
+        return self.status
+
+    def _failed(self, error):
+        self.set_status(state="failed", finished_at=time.time(), error=f"{error.__class__.__name__}: {error}")
+        print(f"❌ Refresh failed: {error}")
+        return self.status
+
+    def _warm_after_ingest(self):
+        # The corpus is already live; a failed warm-up only means cold answers until the next cycle
+        try:
+            self.warm_answers()
+            self.set_status(state="idle", warm_error=None)
+        except Exception as e:
+            self.set_status(state="idle", warm_error=f"{e.__class__.__name__}: {e}")
+            print(f"⚠️ Answer warm-up failed: {e}")
+
+    def rebuild(self, reason=None):
+        """Full blue/green rebuild of the index from the current corpus file. Returns the final status."""
+        try:
+            with ingestion_lock(LOCK_PATH):
+                # Taken under the lock, so a request that finds the worker busy is retried later
+                if os.path.exists(self.request_path):
+                    os.remove(self.request_path)
+                started = time.time()
+                try:
+                    self.set_status(state="rebuilding", started_at=started, finished_at=None, error=None,
+                                    request=reason)
+                    handler = self.make_handler(self.data_path)
+                    self.status["generation"] = handler.rebuild_generation(keep_previous=self.keep_previous)
+                    self.set_status(state="idle", finished_at=time.time(), last_rebuild=time.time(),
+                                    duration_seconds=round(time.time() - started, 1))
+                except Exception as e:
+                    self.set_status(state="failed", finished_at=time.time(), error=f"{e.__class__.__name__}: {e}")
+                    print(f"❌ Rebuild failed: {e}")
+                    return self.status
+                self._warm_after_ingest()
+        except IngestionBusyError:
+            print("⏭️ Another refresh or rebuild is already running; the rebuild request stays queued")
+        return self.status
+
+    def process_request(self):
+        """Handle a queued rebuild request, if any. Returns True if there was one."""
+        request = pending_request(self.request_path)
+        if request is None:
+            return False
+        print(f"📨 Rebuild requested: {request.get('reason') or 'no reason given'}")
+        self.rebuild(request.get("reason"))
+        return True
+
+    def ingest(self, articles, changes):
+        """Embed the changes into a new index generation, then promote the staged corpus file"""
+        self.set_status(state="embedding")
+        # Ingest from the staged corpus, so a failed ingest is retried by the next cycle's diff
+        write_json_atomic(self.staged_path, articles, ensure_ascii=False)
+
+        handler = self.make_handler(self.staged_path)
+        changed_urls = None
+        if handler.list_namespaces(refresh=True):
+            changed_urls = set(changes["added"]) | set(changes["changed"])
+        generation = handler.rebuild_generation(keep_previous=self.keep_previous, changed_urls=changed_urls)
+
+        os.replace(self.staged_path, self.data_path)
+        return generation
+
+    def warm_answers(self):
+        """Precompute the canonical questions, including newly popular ones, missing for the live corpus version"""
+        from answer_store import AnswerStore, canonical_questions, warm_up
+
+        handler = self.make_handler(self.data_path)
+        missing = AnswerStore(handler).missing(canonical_questions())
+        if missing:
+            self.set_status(state="warming")
+            warm_up(handler, missing)
+
+    def run_forever(self, interval, jitter=0.1):
+        """
+        Run a cycle every interval seconds (± jitter), writing the next run
+        time to the status file, and handle rebuild requests in between.
+        """
+        while True:
+            self.process_request()
+            self.run_once()
+            delay = interval * (1 + random.uniform(-jitter, jitter))
+            next_run = time.time() + delay
+            self.set_status(next_run=next_run)
+            print(f"💤 Next refresh in {delay / 3600:.1f}h")
+            while time.time() < next_run:
+                time.sleep(max(0.0, min(REQUEST_POLL_SECONDS, next_run - time.time())))
+                self.process_request()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduled crawl → diff → embed → upsert refresh of the corpus")
+    parser.add_argument("--interval", default="24h", help="Time between refreshes, e.g. 30m, 6h, 1d")
+    parser.add_argument("--once", action="store_true", help="Run a single refresh and exit")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild the index from the current corpus file instead of crawling")
+    parser.add_argument("--index-name", help="Defaults to PINECONE_INDEX_NAME, else fidelity-financial-articles")
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--max-depth", type=int, default=2)
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--keep", type=int, default=1, help="Previous index generations kept for rollback")
+    parser.add_argument("--nice", type=int, default=10, help="CPU niceness increment for the worker")
+    parser.add_argument("--cpus", type=int, default=None, help="Pin the worker to this many cores")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Embedding tokens/minute budget for the worker, leaving the rest of the quota to the app")
+    parser.add_argument("--rpm", type=int, default=None, help="Embedding requests/minute budget for the worker")
+    args = parser.parse_args()
+
+    limit_resources(nice=args.nice, cpus=args.cpus)
+    if args.tpm:
+        os.environ["OPENAI_EMBEDDING_TPM"] = str(args.tpm)
+    if args.rpm:
+        os.environ["OPENAI_EMBEDDING_RPM"] = str(args.rpm)
+
+    worker = RefreshWorker(args.data_path, index_name=args.index_name, max_depth=args.max_depth,
+                           max_pages=args.max_pages, keep_previous=args.keep)
+    if args.rebuild:
+        worker.rebuild("command line")
+    elif args.once:
+        worker.process_request()
+        worker.run_once()
+    else:
+        worker.run_forever(parse_interval(args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Opt-in profiling of single chat requests.
+
+Wrap one answer_question pass in a RequestProfiler to capture a
+deterministic profile (cProfile .pstats, or a speedscope .json flame graph),
+per-stage wall time and peak memory, and a tracemalloc snapshot of where
+memory was allocated. Nothing here runs unless profiling was asked for,
+so the normal chat path pays nothing.
+
+Profiling is off unless the operator sets PROFILE_REQUESTS: "allow" shows
+the "Profile answers" toggle under Admin Controls and honours ?profile=1 in
+the app URL, "1" profiles every request. Output goes to PROFILE_DIR
+(default output/profiles):
+
+    <stamp>-<id>-<question>.pstats          python -m pstats / snakeviz
+    <stamp>-<id>-<question>.speedscope.json https://www.speedscope.app (PROFILE_FORMAT=speedscope)
+    <stamp>-<id>-<question>.tracemalloc     tracemalloc.Snapshot.load
+    <stamp>-<id>-<question>.json            summary: stages, memory, hot functions
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "output/profiles")
+PROFILE_FORMATS = ("pstats", "speedscope")
+
+# Functions whose cumulative time the summary always reports
+KEY_FUNCTIONS = ("query_pinecone", "compress", "build_prompt", "get_openai_response", "format_response_with_references")
+
+TRACEMALLOC_FRAMES = 25
+TOP_ALLOCATIONS = 15
+
+_TRUE = ("1", "true", "yes", "on")
+
+
+def _profile_setting():
+    return os.getenv("PROFILE_REQUESTS", "").strip().lower()
+
+
+def profiling_allowed():
+    """True if the operator allows profiling: PROFILE_REQUESTS=allow (on request) or 1 (always)"""
+    setting = _profile_setting()
+    return setting == "allow" or setting in _TRUE
+
+
+def profiling_requested(flag=None):
+    """
+    True if this request should be profiled. Nothing is unless
+    profiling_allowed(); then an explicit flag (toggle, ?profile=) wins,
+    else only PROFILE_REQUESTS=1 profiles.
+    """
+    if not profiling_allowed():
+        return False
+    if flag is not None:
+        return str(flag).strip().lower() in _TRUE
+    return _profile_setting() in _TRUE
+
+
+def _slug(text, length=40):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower())[:length].strip("-") or "request"
+
+
+class _SpeedscopeTracer:
+    """sys.setprofile tracer recording open/close events in speedscope's evented format"""
+
+    def __init__(self):
+        self.frames = []
+        self._frame_ids = {}
+        self.events = []
+        self._stack = []
+        self._start = None
+
+    def _frame_id(self, key, name, file, line):
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append({"name": name, "file": file, "line": line})
+        return frame_id
+
+    def _trace(self, frame, event, arg):
+        at = time.perf_counter_ns() - self._start
+        if event == "call":
+            code = frame.f_code
+            frame_id = self._frame_id(code, code.co_qualname if hasattr(code, "co_qualname") else code.co_name,
+                                      code.co_filename, code.co_firstlineno)
+        elif event == "c_call":
+            name = f"{getattr(arg, '__module__', None) or 'builtins'}.{getattr(arg, '__qualname__', repr(arg))}"
+            frame_id = self._frame_id(("c", name), name, "<built-in>", 0)
+        else:
+            # return / c_return / c_exception; ignore frames entered before tracing began
+            if self._stack:
+                self.events.append({"type": "C", "frame": self._stack.pop(), "at": at})
+            return
+        self._stack.append(frame_id)
+        self.events.append({"type": "O", "frame": frame_id, "at": at})
+
+    def start(self):
+        self._start = time.perf_counter_ns()
+        sys.setprofile(self._trace)
+
+    def stop(self):
+        sys.setprofile(None)
+        end = time.perf_counter_ns() - self._start
+        while self._stack:
+            self.events.append({"type": "C", "frame": self._stack.pop(), "at": end})
+        return end
+
+    def dump(self, path, name, end):
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "evented",
+                "name": name,
+                "unit": "nanoseconds",
+                "startValue": 0,
+                "endValue": end,
+                "events": self.events
+            }],
+            "name": name,
+            "exporter": "onlyfinance-request-profiler"
+        }
+        with open(path, "w") as f:
+            json.dump(document, f)
+
+
+class RequestProfiler:
+    """
+    Context manager around one chat request. Use wrap_stage() to pass a
+    stage callback to answer_question so each stage's time and peak memory
+    are recorded too.
+
+    Profiling is per thread, so only one request is profiled at a time; a
+    request that finds another one being profiled runs unprofiled.
+    """
+
+    _active = threading.Lock()
+
+    def __init__(self, question, output_dir=None, profile_format=None, memory=True):
+        self.question = question
+        self.output_dir = output_dir or PROFILE_DIR
+        self.profile_format = (profile_format or os.getenv("PROFILE_FORMAT", "pstats")).lower()
+        if self.profile_format not in PROFILE_FORMATS:
+            raise ValueError(f"Unknown profile format '{self.profile_format}', expected one of {PROFILE_FORMATS}")
+        self.memory = memory
+        self.stages = {}
+        self.paths = {}
+        self.summary = None
+        self._owns_lock = False
+
+    def wrap_stage(self, stage=None):
+        """Stage callback that records timings and peak memory, then enters stage(name) if given"""
+
+        @contextmanager
+        def profiled_stage(name):
+            if self.memory and tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            try:
+                with (stage(name) if stage else nullcontext()):
+                    yield
+            finally:
+                record = {"seconds": round(time.perf_counter() - start, 6)}
+                if self.memory and tracemalloc.is_tracing():
+                    current, peak = tracemalloc.get_traced_memory()
+                    record["allocated_kb"] = round((current - before) / 1024, 1)
+                    record["peak_kb"] = round((peak - before) / 1024, 1)
+                self.stages[name] = record
+
+        return profiled_stage
+
+    def __enter__(self):
+        self._owns_lock = self._active.acquire(blocking=False)
+        if not self._owns_lock:
+            return self
+        self._started_tracemalloc = False
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        if self.profile_format == "pstats":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = _SpeedscopeTracer()
+            self._profiler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._owns_lock:
+            return False
+        try:
+            if self.profile_format == "pstats":
+                self._profiler.disable()
+            else:
+                end = self._profiler.stop()
+            total = time.perf_counter() - self._start
+            snapshot = None
+            if self.memory and tracemalloc.is_tracing():
+                # The profiler's own bookkeeping isn't the request's memory
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, __file__),
+                    tracemalloc.Filter(False, tracemalloc.__file__)
+                ])
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            # The random part keeps profiles taken within the same second apart
+            base = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}-"
+                                                 f"{_slug(self.question)}")
+            summary = {
+                "question": self.question,
+                "total_seconds": round(total, 6),
+                "stages": self.stages,
+                "error": repr(exc) if exc else None
+            }
+
+            if self.profile_format == "pstats":
+                self.paths["pstats"] = f"{base}.pstats"
+                self._profiler.dump_stats(self.paths["pstats"])
+                summary["functions"] = self._key_function_times(pstats.Stats(self._profiler))
+            else:
+                self.paths["speedscope"] = f"{base}.speedscope.json"
+                self._profiler.dump(self.paths["speedscope"], self.question, end)
+
+            if snapshot is not None:
+                self.paths["tracemalloc"] = f"{base}.tracemalloc"
+                snapshot.dump(self.paths["tracemalloc"])
+                summary["top_allocations"] = [
+                    {"location": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+                ]
+
+            self.paths["summary"] = f"{base}.json"
+            summary["files"] = dict(self.paths)
+            with open(self.paths["summary"], "w") as f:
+                json.dump(summary, f, indent=2)
+            self.summary = summary
+            print(f"🔬 Profiled request in {total * 1000:.0f}ms → {self.paths['summary']}")
+        finally:
+            self._active.release()
+        return False
+
+    @staticmethod
+    def _key_function_times(stats):
+        """Call count and cumulative seconds for KEY_FUNCTIONS"""
+        functions = {}
+        for (filename, line, name), (_, calls, _, cumulative, _) in stats.stats.items():
+            if name in KEY_FUNCTIONS and "site-packages" not in filename:
+                functions[name] = {"calls": calls, "cumulative_seconds": round(cumulative, 6),
+                                   "location": f"{os.path.basename(filename)}:{line}"}
+        return functions
@@ -1,10 +1,61 @@
 import requests
 from bs4 import BeautifulSoup
+import argparse
 import re
 import time
 import json
 import os
-from urllib.parse import urljoin, urlparse
+from crawl_frontier import MAX_ATTEMPTS, CrawlFrontier
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+BASE_URL = "https://www.fidelity.com/learning-center"
+CHECKPOINT_DIR = os.path.join("output", "crawl_checkpoint")
+# (connect, read) seconds, so one stalled connection can't hang the crawl
+REQUEST_TIMEOUT = (10, 30)
+# Throttling, blocking and server errors are usually transient, so these are retried
+RETRY_STATUS_CODES = {403, 408, 429}
+
+# Utility pages that never hold article content
+SKIP_PATTERNS = ['?', '#', 'page=', 'sort=', 'filter=', 'favorites', 'overview']
+
+def categorize_url(url):
+    """Map a Learning Center URL to one of the 5 main categories (or 'Other')"""
+    url = url.lower()
+    if any(keyword in url for keyword in ['personal-finance', 'budgeting', 'saving', 'debt', 'taxes', 'health-care', 'estate']):
+        return 'Financial Essentials'
+    elif any(keyword in url for keyword in ['life-events', 'college', 'house', 'marriage', 'divorce', 'aging', 'career', 'parenting']):
+        return 'Life Events'
+    elif any(keyword in url for keyword in ['trading-investing', 'investing', 'trading', 'technical-analysis', 'fundamental']):
+        return 'Investing and Trading'
+    elif any(keyword in url for keyword in ['investment-products', 'stocks', 'bonds', 'etf', 'mutual-funds', 'options', 'annuities']):
+        return 'Investment Products'
+    elif any(keyword in url for keyword in ['active-trader', 'margin', 'strategy-guide', 'technical-indicator']):
+        return 'Advanced Trading'
+    return 'Other'
+
+def extract_learning_center_links(soup):
+    """Collect (absolute url, link text) pairs for Learning Center pages on a page"""
+    learning_center_links = set()
+    
+    for link in soup.find_all('a', href=True):
+        href = link.get('href')
+        text = link.get_text(strip=True)
+        
+        if href:
+            # Convert relative to absolute URLs
+            if href.startswith('/'):
+                href = f"https://www.fidelity.com{href}"
+            
+            # Only include learning-center URLs
+            if '/learning-center/' in href:
+                # Avoid utility pages
+                if not any(skip in href for skip in SKIP_PATTERNS):
+                    learning_center_links.add((href, text))
+    
+    return learning_center_links
 
 def explore_learning_center_structure():
     """
@@ -16,39 +67,17 @@ def explore_learning_center_structure():
     5. Advanced Trading
     """
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    }
-    
     print("🏗️ Exploring Full Fidelity Learning Center Structure...")
     
-    base_url = "https://www.fidelity.com/learning-center"
-    
     try:
-        response = requests.get(base_url, headers=headers)
+        response = requests.get(BASE_URL, headers=HEADERS, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         soup = BeautifulSoup(response.content, 'html.parser')
         
         print("✅ Successfully loaded main Learning Center page")
         
         # Find all links on the main page
-        all_links = soup.find_all('a', href=True)
-        learning_center_links = set()
-        
-        for link in all_links:
-            href = link.get('href')
-            text = link.get_text(strip=True)
-            
-            if href:
-                # Convert relative to absolute URLs
-                if href.startswith('/'):
-                    href = f"https://www.fidelity.com{href}"
-                
-                # Only include learning-center URLs
-                if '/learning-center/' in href:
-                    # Avoid utility pages
-                    if not any(skip in href for skip in ['?', '#', 'page=', 'sort=', 'filter=', 'favorites', 'overview']):
-                        learning_center_links.add((href, text))
+        learning_center_links = extract_learning_center_links(soup)
         
         print(f"🔍 Found {len(learning_center_links)} Learning Center links")
         
@@ -63,18 +92,7 @@ def explore_learning_center_structure():
         }
         
         for url, text in learning_center_links:
-            if any(keyword in url.lower() for keyword in ['personal-finance', 'budgeting', 'saving', 'debt', 'taxes', 'health-care', 'estate']):
-                categories['Financial Essentials'].append((url, text))
-            elif any(keyword in url.lower() for keyword in ['life-events', 'college', 'house', 'marriage', 'divorce', 'aging', 'career', 'parenting']):
-                categories['Life Events'].append((url, text))
-            elif any(keyword in url.lower() for keyword in ['trading-investing', 'investing', 'trading', 'technical-analysis', 'fundamental']):
-                categories['Investing and Trading'].append((url, text))
-            elif any(keyword in url.lower() for keyword in ['investment-products', 'stocks', 'bonds', 'etf', 'mutual-funds', 'options', 'annuities']):
-                categories['Investment Products'].append((url, text))
-            elif any(keyword in url.lower() for keyword in ['active-trader', 'margin', 'strategy-guide', 'technical-indicator']):
-                categories['Advanced Trading'].append((url, text))
-            else:
-                categories['Other'].append((url, text))
+            categories[categorize_url(url)].append((url, text))
         
         # Print category breakdown
         print("\n📊 Learning Center Categories:")
@@ -92,133 +110,180 @@ def explore_learning_center_structure():
         print(f"❌ Error exploring structure: {e}")
         return {}
 
-def get_article_content(url, headers):
+def extract_article_content(soup, url):
     """
-    Extract actual article content from a Learning Center URL.
+    Extract article title and content from an already-parsed Learning Center page.
+    Returns None if the page does not contain enough article text.
     """
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            return None
-            
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Get title
-        title = None
-        title_selectors = ['h1', '.hero-title', '.page-title', '.article-title']
-        for selector in title_selectors:
-            title_elem = soup.select_one(selector)
-            if title_elem:
-                title = title_elem.get_text(strip=True)
-                if title and len(title) > 5:
-                    break
-        
-        if not title:
-            title = url.split('/')[-1].replace('-', ' ').title()
-        
-        # Get content
-        content = None
-        content_selectors = [
-            '.rich-text',
-            '[data-module="RichText"]',
-            '.article-body',
-            '.learn-content',
-            '.content-area',
-            'main .content',
-            '.page-content'
-        ]
-        
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                # Remove unwanted elements
-                for unwanted in content_elem.select('nav, .nav, header, footer, .sidebar, .breadcrumb, script, style, .social-share'):
-                    unwanted.decompose()
-                
-                content = content_elem.get_text(separator=' ', strip=True)
-                if content and len(content) > 500:
-                    break
-                content = None
-        
-        # Fallback: extract meaningful paragraphs
-        if not content:
-            paragraphs = soup.find_all('p')
-            meaningful_paragraphs = []
-            
-            for p in paragraphs:
-                text = p.get_text(strip=True)
-                if (len(text) > 50 and 
-                    not any(skip in text.lower() for skip in ['sign in', 'menu', 'search', 'subscribe', 'copyright', '©']) and
-                    len(text.split()) > 8):
-                    meaningful_paragraphs.append(text)
+    # Get title
+    title = None
+    title_selectors = ['h1', '.hero-title', '.page-title', '.article-title']
+    for selector in title_selectors:
+        title_elem = soup.select_one(selector)
+        if title_elem:
+            title = title_elem.get_text(strip=True)
+            if title and len(title) > 5:
+                break
+    
+    if not title:
+        title = url.split('/')[-1].replace('-', ' ').title()
+    
+    # Get content
+    content = None
+    content_selectors = [
+        '.rich-text',
+        '[data-module="RichText"]',
+        '.article-body',
+        '.learn-content',
+        '.content-area',
+        'main .content',
+        '.page-content'
+    ]
+    
+    for selector in content_selectors:
+        content_elem = soup.select_one(selector)
+        if content_elem:
+            # Remove unwanted elements
+            for unwanted in content_elem.select('nav, .nav, header, footer, .sidebar, .breadcrumb, script, style, .social-share'):
+                unwanted.decompose()
             
-            if meaningful_paragraphs:
-                content = ' '.join(meaningful_paragraphs[:10])
+            content = content_elem.get_text(separator=' ', strip=True)
+            if content and len(content) > 500:
+                break
+            content = None
+    
+    # Fallback: extract meaningful paragraphs
+    if not content:
+        paragraphs = soup.find_all('p')
+        meaningful_paragraphs = []
         
-        # Clean and validate
-        if content:
-            content = re.sub(r'\s+', ' ', content).strip()
-            if len(content) > 300:
-                return {
-                    "title": title,
-                    "content": content[:4000],  # Limit content length
-                    "url": url
-                }
+        for p in paragraphs:
+            text = p.get_text(strip=True)
+            if (len(text) > 50 and 
+                not any(skip in text.lower() for skip in ['sign in', 'menu', 'search', 'subscribe', 'copyright', '©']) and
+                len(text.split()) > 8):
+                meaningful_paragraphs.append(text)
         
+        if meaningful_paragraphs:
+            content = ' '.join(meaningful_paragraphs[:10])
+    
+    # Clean and validate
+    if content:
+        content = re.sub(r'\s+', ' ', content).strip()
+        if len(content) > 300:
+            return {
+                "title": title,
+                "content": content[:4000],  # Limit content length
+                "url": url
+            }
+    
+    return None
+
+def fetch_page(url, headers):
+    """
+    Fetch and parse a page. Raises requests.HTTPError on responses worth
+    retrying (403, 408, 429, 5xx) and returns None on other non-200
+    responses, such as a 404 for a page that no longer exists.
+    """
+    response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code in RETRY_STATUS_CODES or response.status_code >= 500:
+        response.raise_for_status()
+    if response.status_code != 200:
         return None
+    return BeautifulSoup(response.content, 'html.parser')
+
+def get_article_content(url, headers):
+    """
+    Extract actual article content from a Learning Center URL.
+    """
+    try:
+        soup = fetch_page(url, headers)
+        if soup is None:
+            return None
+        return extract_article_content(soup, url)
         
     except Exception as e:
         print(f"    ❌ Error scraping {url}: {e}")
         return None
 
-def scrape_all_learning_center_articles():
+def scrape_all_learning_center_articles(max_depth=2, checkpoint_dir=CHECKPOINT_DIR, max_pages=None, resume=True):
     """
     Scrape ALL articles from all 5 main categories in Learning Center.
+
+    Links are discovered recursively from the landing page up to max_depth
+    hops away. Progress is checkpointed to checkpoint_dir after every page,
+    so re-running after an interruption picks up where the crawl stopped.
+    Pass resume=False to discard an existing checkpoint and start over.
     """
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    }
-    
     print("🎓 Starting COMPREHENSIVE Learning Center scraping...")
     
-    # First, explore the structure
-    categories = explore_learning_center_structure()
-    
-    if not categories:
-        print("❌ Failed to explore structure")
-        return []
+    if not resume:
+        for filename in (CrawlFrontier.FRONTIER_FILE, CrawlFrontier.ARTICLES_FILE):
+            path = os.path.join(checkpoint_dir, filename)
+            if os.path.exists(path):
+                os.remove(path)
     
-    all_articles = []
-    total_urls = sum(len(links) for links in categories.values())
-    current_count = 0
-    
-    print(f"\n🚀 Starting to scrape {total_urls} total articles...")
-    
-    for category_name, links in categories.items():
-        if not links:
-            continue
-            
-        print(f"\n📚 Scraping {category_name} ({len(links)} articles)...")
+    with CrawlFrontier(checkpoint_dir, max_depth=max_depth, max_pages=max_pages) as frontier:
+        if not frontier.seen:
+            frontier.add(BASE_URL, 0, "Learning Center")
         
-        category_success = 0
-        for url, text_preview in links:
-            current_count += 1
-            print(f"  [{current_count}/{total_urls}] {text_preview[:50]}...")
+        print(f"\n🚀 Crawling up to depth {max_depth} (checkpoint: {checkpoint_dir})...")
+        
+        while True:
+            item = frontier.next()
+            if item is None:
+                break
+            url, depth, text_preview = item
+            print(f"  [{frontier.processed_count + 1} done, {len(frontier.pending)} queued] "
+                  f"(depth {depth}) {text_preview[:50]}...")
+            
+            article_data = None
+            error = None
+            try:
+                soup = fetch_page(url, HEADERS)
+                if soup is not None:
+                    # Harvest links before content extraction strips nav elements
+                    if depth < max_depth:
+                        new_links = 0
+                        for href, text in extract_learning_center_links(soup):
+                            if frontier.add(href, depth + 1, text):
+                                new_links += 1
+                        if new_links:
+                            print(f"    🔗 Discovered {new_links} new links")
+                    
+                    # The landing page itself is an index, not an article
+                    if depth > 0:
+                        article_data = extract_article_content(soup, url)
+            except Exception as e:
+                error = f"{e.__class__.__name__}: {e}"
+                print(f"    ❌ Error scraping {url}: {e}")
+            
+            if error is not None:
+                frontier.mark_failed(url, error)
+                time.sleep(0.5)
+                continue
             
-            article_data = get_article_content(url, headers)
             if article_data:
-                article_data['category'] = category_name
-                all_articles.append(article_data)
-                category_success += 1
+                article_data['category'] = categorize_url(url)
                 print(f"    ✅ Success: {len(article_data['content'])} chars")
-            else:
+            elif depth > 0:
                 print(f"    ❌ Failed to extract content")
             
+            frontier.mark_done(url, article_data)
+            
             # Be respectful with timing
             time.sleep(0.5)
         
-        print(f"  📊 {category_name}: {category_success}/{len(links)} successful")
+        if frontier.has_pending():
+            print(f"\n⏸️ Stopped with {len(frontier.pending)} URLs still queued and {len(frontier.failed)} "
+                  f"failed; re-run to continue")
+        if frontier.given_up:
+            print(f"\n⚠️ Gave up on {len(frontier.given_up)} URLs after {MAX_ATTEMPTS} failed attempts:")
+            for url in frontier.given_up:
+                print(f"    • {url}")
+        
+        all_articles = frontier.load_articles()
     
     print(f"\n🎉 TOTAL: Successfully scraped {len(all_articles)} articles!")
     return all_articles
@@ -260,10 +325,22 @@ def save_comprehensive_articles(articles):
         print(f"Error saving articles: {e}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl the Fidelity Learning Center")
+    parser.add_argument("--max-depth", type=int, default=2, help="Link hops to follow from the landing page")
+    parser.add_argument("--max-pages", type=int, default=None, help="Stop after this many pages (resume later)")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help="Directory for crawl checkpoints")
+    parser.add_argument("--fresh", action="store_true", help="Ignore any existing checkpoint and start over")
+    args = parser.parse_args()
+    
     print("Starting COMPREHENSIVE Fidelity Learning Center scraper...")
     print("This will properly explore all 5 main categories and scrape ALL articles.")
     
-    articles = scrape_all_learning_center_articles()
+    articles = scrape_all_learning_center_articles(
+        max_depth=args.max_depth,
+        checkpoint_dir=args.checkpoint_dir,
+        max_pages=args.max_pages,
+        resume=not args.fresh
+    )
     
     if articles:
         save_comprehensive_articles(articles)
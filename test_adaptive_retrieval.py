@@ -0,0 +1,48 @@
+"""Cutoffs of the score-adaptive top_k"""
+import pytest
+
+from adaptive_retrieval import AdaptiveTopK
+
+
+def _select(scores, tokens=None, **kwargs):
+    settings = dict(candidates=10, min_k=1, max_k=6, min_score=0.3, max_relative_drop=0.15,
+                    max_context_tokens=1000)
+    settings.update(kwargs)
+    return AdaptiveTopK(**settings).select(scores, tokens if tokens is not None else [100] * len(scores))
+
+
+def test_relative_drop_ends_the_prefix():
+    # 0.5 is more than 15% below 0.62
+    assert _select([0.62, 0.60, 0.55, 0.50, 0.49]) == 3
+
+
+def test_score_floor_keeps_min_k():
+    assert _select([0.25, 0.24, 0.23]) == 1
+    assert _select([0.25, 0.24], min_k=0) == 0
+
+
+def test_token_cap_and_max_k():
+    assert _select([0.7] * 8, [300] * 8) == 3
+    assert _select([0.7] * 8, [10] * 8) == 6
+
+
+def test_first_failure_ends_the_prefix():
+    # The third candidate is too long; the fourth would fit but comes after it
+    assert _select([0.7, 0.7, 0.7, 0.7], [100, 100, 900, 10]) == 2
+
+
+def test_no_candidates():
+    assert _select([]) == 0
+
+
+def test_invalid_bounds():
+    with pytest.raises(ValueError):
+        AdaptiveTopK(candidates=4, max_k=6)
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("ADAPTIVE_TOP_K", "off")
+    assert AdaptiveTopK.from_env() is None
+    monkeypatch.setenv("ADAPTIVE_TOP_K", "on")
+    monkeypatch.setenv("ADAPTIVE_MIN_SCORE", "0.4")
+    assert AdaptiveTopK.from_env().min_score == 0.4
@@ -0,0 +1,64 @@
+"""Question normalization and incremental warm-up of answer_store"""
+import json
+
+from answer_store import AnswerStore, QueryLog, canonical_questions, normalize_question, warm_up
+from data_handler import DataHandler
+from local_backends import LocalChatClient, LocalEmbeddings, LocalIndex
+
+DIMENSION = 64
+
+
+def test_normalize_question():
+    assert normalize_question("  What is a Roth IRA?? ") == normalize_question("what is a roth ira")
+
+
+def test_canonical_questions_adds_popular_logged_ones(tmp_path):
+    log = QueryLog(str(tmp_path / "log.jsonl"), enabled=True)
+    for _ in range(3):
+        log.record("How do bonds work?")
+    log.record("Asked once")
+    questions = canonical_questions(query_log=log)
+    assert "How do bonds work?" in questions
+    assert "Asked once" not in questions
+
+
+def test_query_log_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.delenv("LOG_QUERIES", raising=False)
+    log = QueryLog(str(tmp_path / "log.jsonl"))
+    log.record("How do bonds work?")
+    assert not (tmp_path / "log.jsonl").exists()
+
+    monkeypatch.setenv("LOG_QUERIES", "1")
+    QueryLog(str(tmp_path / "log.jsonl")).record("How do bonds work?")
+    assert (tmp_path / "log.jsonl").exists()
+
+
+def test_query_log_rotates_at_max_bytes(tmp_path):
+    path = tmp_path / "log.jsonl"
+    log = QueryLog(str(path), enabled=True, max_bytes=200)
+    for i in range(30):
+        log.record("How do bonds work?" if i % 2 else f"Question {i}")
+    assert path.stat().st_size < 200 + 100
+    assert (tmp_path / "log.jsonl.1").stat().st_size < 200 + 100
+    # Counts come from the current and the rotated file only
+    assert log.popular(min_count=2) == ["How do bonds work?"]
+
+
+def test_warm_up_adds_missing_questions_and_keeps_stored_ones(tmp_path):
+    corpus = tmp_path / "corpus.json"
+    corpus.write_text(json.dumps([]))
+    handler = DataHandler(str(corpus), index=LocalIndex(dimension=DIMENSION),
+                          embedding_function=LocalEmbeddings(dimension=DIMENSION),
+                          alias_dir=str(tmp_path / "alias"), embedding_dimension=DIMENSION)
+    store_dir = str(tmp_path / "store")
+    store = AnswerStore(handler, store_dir)
+    client = LocalChatClient()
+
+    warm_up(handler, ["What is a Roth IRA?"], completion_client=client, store_dir=store_dir)
+    assert store.missing(["What is a Roth IRA?", "How do bonds work?"]) == ["How do bonds work?"]
+
+    warm_up(handler, store.missing(["What is a Roth IRA?", "How do bonds work?"]),
+            completion_client=client, store_dir=store_dir)
+    assert store.missing(["What is a Roth IRA?", "How do bonds work?"]) == []
+    assert len(store) == 2
+    assert store.lookup("what is a roth ira") is not None
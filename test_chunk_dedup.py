@@ -0,0 +1,40 @@
+"""LSH band selection and near-duplicate detection of chunk_dedup"""
+from chunk_dedup import MinHashDeduplicator, choose_bands, dedup_chunks
+
+BASE = " ".join(f"word{i}" for i in range(60))
+# One word changed: ~0.96 shingle Jaccard similarity with BASE
+NEAR = BASE.replace("word59", "other59")
+# Six words changed: ~0.70 similarity
+PARTIAL = " ".join(f"other{i}" if 30 <= i < 36 else f"word{i}" for i in range(60))
+UNRELATED = " ".join(f"term{i}" for i in range(60))
+
+
+def test_choose_bands_splits_the_signature_near_the_threshold():
+    for threshold in (0.5, 0.85, 0.95):
+        bands, rows = choose_bands(128, threshold)
+        assert bands * rows == 128
+        assert abs((1 / bands) ** (1 / rows) - threshold) < 0.1
+    # A stricter threshold needs longer bands
+    assert choose_bands(128, 0.95)[1] >= choose_bands(128, 0.5)[1]
+
+
+def test_find_duplicates_keeps_the_first_occurrence():
+    duplicates = MinHashDeduplicator(threshold=0.85).find_duplicates([BASE, UNRELATED, NEAR, BASE])
+    assert duplicates == {2: 0, 3: 0}
+
+
+def test_find_duplicates_respects_the_threshold():
+    assert MinHashDeduplicator(threshold=0.5).find_duplicates([BASE, PARTIAL]) == {1: 0}
+    assert MinHashDeduplicator(threshold=0.9).find_duplicates([BASE, PARTIAL]) == {}
+
+
+def test_dedup_chunks_only_compares_within_a_group():
+    docs = [{"text": BASE, "metadata": {"category": "A"}},
+            {"text": NEAR, "metadata": {"category": "B"}},
+            {"text": NEAR, "metadata": {"category": "A"}}]
+    kept, report = dedup_chunks(docs, group_key=lambda doc: doc["metadata"]["category"])
+    assert kept == docs[:2]
+    assert report["removed_chunks"] == 1 and report["tokens_saved"] > 0
+
+    kept, _ = dedup_chunks(docs)
+    assert kept == docs[:1]
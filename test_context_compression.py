@@ -0,0 +1,68 @@
+"""Sentence scoring, selection and the default compressor of context_compression"""
+import utils
+from context_compression import ContextCompressor, score_sentences, split_sentences
+
+
+def test_split_sentences():
+    assert split_sentences("Bonds pay interest. Stocks are equity! Why? Because.") == [
+        "Bonds pay interest.", "Stocks are equity!", "Why?", "Because."
+    ]
+
+
+def test_score_sentences_prefers_query_terms():
+    scores = score_sentences("How do bonds pay interest?",
+                             ["Bonds pay interest twice a year.", "The weather was nice."])
+    assert scores[0] > 0
+    assert scores[1] == 0
+
+
+def test_compress_keeps_relevant_sentences_in_order():
+    chunks = [
+        "A Roth IRA is funded with after-tax money. The office is closed on Sundays.",
+        "Parking is free downtown. Roth IRA withdrawals in retirement are tax-free."
+    ]
+    metadatas = [{"url": "a"}, {"url": "b"}]
+    compressor = ContextCompressor(ratio=0.75)
+    kept, kept_metadatas, stats = compressor.compress("How is a Roth IRA taxed?", chunks, metadatas)
+    assert kept == ["A Roth IRA is funded with after-tax money.",
+                    "Roth IRA withdrawals in retirement are tax-free."]
+    assert kept_metadatas == metadatas
+    assert stats["compressed_tokens"] < stats["original_tokens"]
+
+
+def test_compress_drops_chunks_without_relevant_sentences():
+    chunks = ["Roth IRA contributions use after-tax dollars.", "The cafeteria serves lunch at noon."]
+    compressor = ContextCompressor(ratio=0.5)
+    kept, kept_metadatas, _ = compressor.compress("Roth IRA contributions", chunks, [{"url": "a"}, {"url": "b"}])
+    assert kept == [chunks[0]]
+    assert kept_metadatas == [{"url": "a"}]
+
+
+def test_compress_passes_through_unrelated_context():
+    chunks = ["The cafeteria serves lunch at noon."]
+    kept, _, stats = ContextCompressor().compress("Roth IRA", chunks)
+    assert kept == chunks
+    assert stats["ratio"] == 1.0
+
+
+def _default_compressor(monkeypatch, **env):
+    monkeypatch.setattr(utils, "_default_compressor", None)
+    for name in ("CONTEXT_COMPRESSION_RATIO", "CONTEXT_TOKEN_BUDGET", "CONTEXT_COMPRESSION_VERBOSE"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return utils.default_compressor()
+
+
+def test_default_compressor_is_quiet_unless_verbose(monkeypatch, capsys):
+    chunks = ["Roth IRA contributions use after-tax dollars.", "The cafeteria serves lunch at noon."]
+    _default_compressor(monkeypatch).compress("Roth IRA", chunks)
+    assert capsys.readouterr().out == ""
+
+    _default_compressor(monkeypatch, CONTEXT_COMPRESSION_VERBOSE="1").compress("Roth IRA", chunks)
+    assert "Context compressed" in capsys.readouterr().out
+
+
+def test_default_compressor_can_be_disabled(monkeypatch):
+    assert _default_compressor(monkeypatch, CONTEXT_COMPRESSION_RATIO="off") is None
+    assert _default_compressor(monkeypatch, CONTEXT_TOKEN_BUDGET="300").token_budget == 300
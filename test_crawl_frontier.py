@@ -0,0 +1,64 @@
+"""URL normalization and checkpoint resume behaviour of crawl_frontier"""
+from crawl_frontier import MAX_ATTEMPTS, CrawlFrontier, normalize_url
+
+
+def test_normalize_url_collapses_spellings():
+    canonical = "https://www.fidelity.com/learning-center/retirement"
+    for url in ("HTTPS://WWW.Fidelity.com/learning-center/retirement/",
+                "https://www.fidelity.com:443//learning-center/retirement?utm=1#top",
+                "/learning-center/retirement"):
+        assert normalize_url(url, base_url="https://www.fidelity.com/") == canonical
+    assert normalize_url("http://example.com:8080/a/") == "http://example.com:8080/a"
+    assert normalize_url("mailto:someone@example.com") is None
+    assert normalize_url("") is None
+
+
+def _crawl(frontier, fail=()):
+    crawled = []
+    while True:
+        item = frontier.next()
+        if item is None:
+            return crawled
+        url = item[0]
+        crawled.append(url)
+        if url in fail:
+            frontier.mark_failed(url, "ConnectionError")
+        else:
+            frontier.mark_done(url, {"url": url})
+
+
+def test_max_pages_applies_per_run(tmp_path):
+    urls = [f"https://example.com/{i}" for i in range(5)]
+    with CrawlFrontier(str(tmp_path), max_pages=2) as frontier:
+        for url in urls:
+            frontier.add(url, 0)
+        assert _crawl(frontier) == urls[:2]
+
+    # Resuming with the same limit continues instead of stopping immediately
+    with CrawlFrontier(str(tmp_path), max_pages=2) as frontier:
+        assert _crawl(frontier) == urls[2:4]
+    with CrawlFrontier(str(tmp_path), max_pages=2) as frontier:
+        assert _crawl(frontier) == urls[4:]
+        assert not frontier.has_pending()
+        assert len(frontier.load_articles()) == 5
+
+
+def test_failed_urls_are_retried_on_resume(tmp_path):
+    flaky = "https://example.com/flaky"
+    with CrawlFrontier(str(tmp_path)) as frontier:
+        frontier.add("https://example.com/ok", 0)
+        frontier.add(flaky, 0)
+        _crawl(frontier, fail={flaky})
+        assert frontier.has_pending()
+
+    for _ in range(MAX_ATTEMPTS - 1):
+        with CrawlFrontier(str(tmp_path)) as frontier:
+            assert _crawl(frontier, fail={flaky}) == [flaky]
+
+    # Given up on after MAX_ATTEMPTS failures, and reported as such
+    assert not frontier.has_pending()
+    assert frontier.given_up == [flaky]
+    with CrawlFrontier(str(tmp_path)) as frontier:
+        assert _crawl(frontier) == []
+        assert not frontier.has_pending()
+        assert frontier.given_up == [flaky]
@@ -0,0 +1,147 @@
+"""Namespace placement, routing, rebuilds and adaptive retrieval of DataHandler against the in-memory backends"""
+import json
+
+from data_handler import DEFAULT_CATEGORY, DataHandler, category_namespace, route_categories
+from index_generations import generation_namespace
+from local_backends import LocalEmbeddings, LocalIndex
+
+DIMENSION = 64
+
+
+def _handler(tmp_path, **kwargs):
+    return DataHandler(str(tmp_path / "corpus.json"), index=LocalIndex(dimension=DIMENSION),
+                       embedding_function=LocalEmbeddings(dimension=DIMENSION), alias_dir=str(tmp_path / "alias"),
+                       embedding_dimension=DIMENSION, **kwargs)
+
+
+def _write_corpus(tmp_path, articles):
+    (tmp_path / "corpus.json").write_text(json.dumps([
+        {"title": title, "content": content, "url": f"https://x/{i}", "category": category}
+        for i, (title, content, category) in enumerate(articles)
+    ]))
+
+
+ARTICLES = [
+    ("Roth IRA basics", "A Roth IRA is funded with after-tax money. Qualified withdrawals are tax-free. " * 8,
+     "Financial Essentials"),
+    ("Buying a house", "Save for a down payment before you apply for a mortgage. Compare mortgage rates. " * 8,
+     "Life Events"),
+    ("Bond ladders", "A bond ladder staggers bond maturities to manage interest rate risk. " * 8,
+     "Investment Products")
+]
+
+
+def _upsert(handler, namespace, vector_id, text, url, category=None):
+    metadata = {"text": text, "source": "Test", "url": url}
+    if category:
+        metadata["category"] = category
+    values = handler.embedding_function.embed_query(text)
+    handler.index.upsert(vectors=[{"id": vector_id, "values": values, "metadata": metadata}], namespace=namespace)
+
+
+def test_copy_from_legacy_namespace_places_vectors_by_category(tmp_path):
+    handler = _handler(tmp_path)
+    _upsert(handler, "", "a", "Roth IRA contribution limits", "https://x/ira", "Financial Essentials")
+    _upsert(handler, "", "b", "Buying a house with a mortgage", "https://x/house", "Life Events")
+    _upsert(handler, "", "c", "Old article", "https://x/old")
+
+    copied = handler.copy_generation_vectors("", "g1", {"https://x/ira", "https://x/house", "https://x/old"})
+
+    assert copied == {
+        generation_namespace("g1", category_namespace("Financial Essentials")): 1,
+        generation_namespace("g1", category_namespace("Life Events")): 1,
+        generation_namespace("g1", category_namespace(None)): 1
+    }
+    results = handler.query_pinecone("mortgage house", categories=["Life Events"], generation="g1", top_k=1)
+    assert results["metadatas"][0][0]["url"] == "https://x/house"
+
+
+def test_index_name_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("PINECONE_INDEX_NAME", "fidelity-financial-articles-512d")
+    handler = _handler(tmp_path)
+    assert handler.index_name == "fidelity-financial-articles-512d"
+    assert handler.alias.path.endswith("fidelity-financial-articles-512d.json")
+    assert _handler(tmp_path, index_name="explicit").index_name == "explicit"
+
+
+def test_adaptive_top_k_trims_and_explicit_top_k_is_fixed(tmp_path):
+    from adaptive_retrieval import AdaptiveTopK
+
+    handler = _handler(tmp_path, adaptive_top_k=AdaptiveTopK(candidates=5, max_k=3, min_score=0.5))
+    texts = ["roth ira contribution limits", "roth ira withdrawal rules", "roth ira conversion",
+             "mortgage rates today", "college savings plans"]
+    for i, text in enumerate(texts):
+        _upsert(handler, "", str(i), text, f"https://x/{i}")
+
+    adaptive = handler.query_pinecone("roth ira", route=False)
+    assert 1 <= len(adaptive["documents"][0]) <= 3
+    assert all("roth" in text for text in adaptive["documents"][0])
+    assert len(handler.query_pinecone("roth ira", route=False, top_k=5)["documents"][0]) == 5
+
+
+def test_rebuild_validates_and_switches_with_injected_backends(tmp_path, monkeypatch):
+    # The injected embedder must serve bulk ingestion too; any OpenAI call would fail without a key
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    _write_corpus(tmp_path, ARTICLES)
+    handler = _handler(tmp_path, dedup_threshold=None)
+
+    first = handler.rebuild_generation(smoke_questions=["What is a Roth IRA?"], timeout=0)
+    assert handler.active_generation() == first
+    counts = handler.generation_counts()
+    assert set(counts) == {first} and counts[first] > 0
+    assert handler.embedding_scheduler.stats["inputs"] == counts[first]
+
+    second = handler.rebuild_generation(smoke_questions=["How do bond ladders work?"], timeout=0)
+    assert handler.active_generation() == second
+    assert handler.alias.previous() == [first]
+    results = handler.query_pinecone("mortgage down payment", top_k=1)
+    assert results["metadatas"][0][0]["url"] == "https://x/1"
+
+
+def test_dedup_drops_near_duplicates_within_a_category_only(tmp_path):
+    text = " ".join(f"word{i}" for i in range(60)) + "."
+    _write_corpus(tmp_path, [("Original", text, "Life Events"),
+                             ("Syndicated copy", text, "Life Events"),
+                             ("Cross-listed copy", text, "Investment Products")])
+    handler = _handler(tmp_path, dedup_threshold=0.85)
+    kept = handler.dedup(handler.chunk_data(handler.load_data()))
+    assert [(doc["metadata"]["source"], doc["metadata"]["category"]) for doc in kept] == [
+        ("Original", "Life Events"), ("Cross-listed copy", "Investment Products")
+    ]
+    assert len(_handler(tmp_path, dedup_threshold=None).dedup(handler.chunk_data(handler.load_data()))) == 3
+
+
+def test_route_categories_matches_whole_words():
+    assert route_categories("How do options work?") == ["Investment Products", DEFAULT_CATEGORY]
+    assert route_categories("Is a will optional?") is None
+    assert route_categories("Is investing in ETFs safe?") == ["Investing and Trading", "Investment Products",
+                                                               DEFAULT_CATEGORY]
+    assert route_categories("Taxes after getting married") == ["Financial Essentials", "Life Events",
+                                                                DEFAULT_CATEGORY]
+    assert route_categories("How much is a taxi to the airport?") is None
+
+
+def test_rebuild_category_switches_to_a_new_generation(tmp_path):
+    _write_corpus(tmp_path, ARTICLES)
+    handler = _handler(tmp_path, dedup_threshold=None)
+    first = handler.rebuild_generation(smoke_questions=[], timeout=0)
+    counts = {ns: handler.index.describe_index_stats()["namespaces"][ns]["vector_count"]
+              for ns in handler.list_namespaces(refresh=True)}
+
+    updated = [ARTICLES[0], ("Buying a house", "Closing costs add two to five percent to the price. " * 8,
+                             "Life Events"), ARTICLES[2]]
+    _write_corpus(tmp_path, updated)
+    second = handler.rebuild_category("Life Events", smoke_questions=[], timeout=0)
+
+    assert second != first and handler.active_generation() == second
+    assert handler.alias.previous() == [first]
+    # Only the rebuilt category was embedded again; the others were copied
+    namespaces = handler.index.describe_index_stats()["namespaces"]
+    rebuilt = namespaces[generation_namespace(second, category_namespace("Life Events"))]["vector_count"]
+    assert handler.embedding_scheduler.stats["inputs"] == rebuilt
+    for category in ("Financial Essentials", "Investment Products"):
+        copied = namespaces[generation_namespace(second, category_namespace(category))]["vector_count"]
+        assert copied == counts[generation_namespace(first, category_namespace(category))]
+    results = handler.query_pinecone("closing costs", categories=["Life Events"], top_k=1)
+    assert results["documents"][0][0].startswith("Closing costs")
+    assert handler.rebuild_category("Advanced Trading") is None
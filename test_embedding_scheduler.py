@@ -0,0 +1,29 @@
+"""Request packing and rate-limit bookkeeping of embedding_scheduler"""
+from embedding_scheduler import EmbeddingScheduler, TokenBucket, pack_batches, parse_reset_duration
+
+
+def test_pack_batches_respects_token_and_input_limits():
+    assert pack_batches([40, 40, 40, 40], max_tokens=100, max_inputs=10) == [(0, 2), (2, 4)]
+    assert pack_batches([1] * 5, max_tokens=100, max_inputs=2) == [(0, 2), (2, 4), (4, 5)]
+    # An input over the token limit still goes out, alone
+    assert pack_batches([10, 500, 10], max_tokens=100, max_inputs=10) == [(0, 1), (1, 2), (2, 3)]
+    assert pack_batches([], max_tokens=100, max_inputs=10) == []
+
+
+def test_request_size_is_capped_by_tokens_per_minute():
+    assert EmbeddingScheduler(tokens_per_minute=100_000).max_tokens_per_request == 90_000
+    assert EmbeddingScheduler(tokens_per_minute=1_000_000).max_tokens_per_request == 270_000
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60, now=bucket.updated) == 0.0
+    bucket.consume(60, now=bucket.updated)
+    assert bucket.wait_time(30, now=bucket.updated) == 30.0
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("20ms") == 0.02
+    assert parse_reset_duration("6m0s") == 360
+    assert parse_reset_duration("1.5") == 1.5
+    assert parse_reset_duration("") is None
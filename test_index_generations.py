@@ -0,0 +1,54 @@
+"""Generation naming and the ingestion lock of index_generations"""
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from index_generations import (IngestionBusyError, generation_namespace, ingestion_lock, new_generation_id,
+                               split_namespace)
+
+
+def test_namespace_round_trip():
+    assert split_namespace(generation_namespace("g1", "retirement")) == ("g1", "retirement")
+    assert split_namespace(generation_namespace("", "retirement")) == ("", "retirement")
+
+
+def test_new_generation_id_avoids_taken():
+    first = new_generation_id()
+    assert new_generation_id(taken={first}) != first
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_ingestion_lock_is_reentrant_but_exclusive(tmp_path):
+    path = str(tmp_path / "ingestion.lock")
+    probe = ("import sys; from index_generations import IngestionBusyError, ingestion_lock\n"
+             f"try:\n    with ingestion_lock({path!r}): sys.exit(0)\n"
+             "except IngestionBusyError: sys.exit(3)")
+    with ingestion_lock(path):
+        with ingestion_lock(path):
+            pass
+
+        errors = []
+
+        def other_thread():
+            try:
+                with ingestion_lock(path):
+                    pass
+            except IngestionBusyError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+        assert errors
+        assert subprocess.run([sys.executable, "-c", probe], cwd=HERE).returncode == 3
+
+    assert subprocess.run([sys.executable, "-c", probe], cwd=HERE).returncode == 0
+    with pytest.raises(ValueError), ingestion_lock(path):
+        raise ValueError
+    with ingestion_lock(path):
+        pass
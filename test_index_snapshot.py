@@ -0,0 +1,36 @@
+"""Export → import round trip of index_snapshot against the in-memory index"""
+from index_generations import IndexAlias
+from index_snapshot import export_snapshot, import_snapshot
+from local_backends import LocalIndex
+
+DIMENSION = 8
+
+
+def _vector(i):
+    return [float(i + 1)] + [0.0] * (DIMENSION - 1)
+
+
+def test_round_trip_keeps_metadata_and_alias(tmp_path):
+    source = LocalIndex(dimension=DIMENSION)
+    # Legacy vectors sort first and have no category key
+    source.upsert([{"id": "a", "values": _vector(0), "metadata": {"text": "old", "url": "u0"}}], namespace="")
+    source.upsert([{"id": "b", "values": _vector(1), "metadata": {"text": "new", "url": "u1", "category": "Retirement"}}],
+                  namespace="g1__retirement")
+    alias = IndexAlias(str(tmp_path / "source.json"))
+    alias.switch("g1")
+
+    snapshot = str(tmp_path / "snapshot")
+    manifest = export_snapshot(source, snapshot, "model", DIMENSION, alias=alias)
+    assert manifest["alias"]["active"] == "g1"
+
+    target = LocalIndex(dimension=DIMENSION)
+    restored_alias = IndexAlias(str(tmp_path / "target.json"))
+    assert import_snapshot(target, snapshot, model="model", dimension=DIMENSION, alias=restored_alias) == 2
+
+    assert restored_alias.active() == "g1"
+    assert restored_alias.previous() == [""]
+    legacy = target.fetch(ids=["a"], namespace="").vectors["a"]
+    assert legacy.metadata == {"text": "old", "url": "u0"}
+    routed = target.fetch(ids=["b"], namespace="g1__retirement").vectors["b"]
+    assert routed.metadata == {"text": "new", "url": "u1", "category": "Retirement"}
+    assert routed.values == _vector(1)
@@ -0,0 +1,32 @@
+"""Closed-loop load level and report of load_test against the local stand-in backends"""
+import json
+
+from load_test import PERCENTILES, QuestionPicker, SessionFactory, load_question_mix, run_level, summarize
+
+ARTICLES = [
+    {"title": "Roth IRA basics", "url": "https://x/roth", "category": "Financial Essentials",
+     "content": "A Roth IRA is funded with after-tax money. Qualified withdrawals are tax-free. " * 8},
+    {"title": "Bond ladders", "url": "https://x/bonds", "category": "Investment Products",
+     "content": "A bond ladder staggers bond maturities to manage interest rate risk. " * 8}
+]
+
+
+def test_closed_loop_level_reports_counts_and_percentiles(tmp_path):
+    data_path = str(tmp_path / "corpus.json")
+    with open(data_path, "w") as f:
+        json.dump(ARTICLES, f)
+    factory = SessionFactory("local", data_path, "none", seed=1, store_dir=str(tmp_path / "store"))
+    picker = QuestionPicker(load_question_mix(data_path, seed=1), seed=1)
+
+    results, elapsed = run_level(factory, picker, sessions=2, duration=0.3, think_time=0.0, arrival_rate=None)
+    summary = summarize(results, elapsed, sessions=2)
+
+    assert summary["sessions"] == 2
+    assert summary["requests"] == len(results) > 0
+    assert summary["errors"] == 0, summary["sample_errors"]
+    assert summary["throughput_rps"] == round(len(results) / elapsed, 3)
+    for stage in ("answer_store", "retrieve", "completion", "total"):
+        stats = summary["latency_ms"][stage]
+        ordered = [stats[f"p{p}"] for p in PERCENTILES] + [stats["max"]]
+        assert ordered == sorted(ordered)
+    assert "queue" not in summary["latency_ms"]
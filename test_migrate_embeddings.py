@@ -0,0 +1,61 @@
+"""Reprojection of stored vectors to a new dimension in migrate_embeddings"""
+import json
+
+import numpy as np
+import pytest
+
+from data_handler import DataHandler
+from index_snapshot import iter_namespace_vectors
+from local_backends import LocalEmbeddings, LocalIndex
+from migrate_embeddings import migrate_reproject, reproject
+
+ARTICLES = [
+    {"title": "Roth IRA basics", "url": "https://x/roth", "category": "Financial Essentials",
+     "content": "A Roth IRA is funded with after-tax money. Qualified withdrawals are tax-free. " * 8},
+    {"title": "Buying a house", "url": "https://x/house", "category": "Life Events",
+     "content": "Save for a down payment before you apply for a mortgage. Compare mortgage rates. " * 8}
+]
+
+
+def _handler(tmp_path, name, dimension):
+    return DataHandler(str(tmp_path / "corpus.json"), index=LocalIndex(dimension=dimension),
+                       embedding_function=LocalEmbeddings(dimension=dimension), index_name=name,
+                       alias_dir=str(tmp_path / "alias"), embedding_dimension=dimension, dedup_threshold=None)
+
+
+def _vectors(handler):
+    vectors = {}
+    for namespace in handler.list_namespaces(refresh=True):
+        for batch in iter_namespace_vectors(handler.index, namespace):
+            vectors.update({vector.id: (namespace, vector) for vector in batch})
+    return vectors
+
+
+def test_reproject_keeps_a_renormalized_prefix():
+    vectors = np.array([[3.0, 4.0, 12.0], [0.0, 0.0, 1.0]])
+    reprojected = reproject(vectors, 2)
+    assert np.allclose(reprojected, [[0.6, 0.8], [0.0, 0.0]])
+    with pytest.raises(ValueError):
+        reproject(vectors, 4)
+
+
+def test_migrate_reproject_preserves_count_and_metadata(tmp_path):
+    (tmp_path / "corpus.json").write_text(json.dumps(ARTICLES))
+    source = _handler(tmp_path, "source", 64)
+    source.rebuild_generation(smoke_questions=[], timeout=0)
+    # Only the live generation is migrated, not the one kept for rollback
+    live = source.rebuild_generation(smoke_questions=[], timeout=0)
+    target = _handler(tmp_path, "target", 32)
+
+    copied = migrate_reproject(source, target, workers=2)
+
+    assert copied == source.generation_counts()[live]
+    assert target.generation_counts() == {"": copied}
+    source_vectors, target_vectors = _vectors(source), _vectors(target)
+    assert source_vectors.keys() == target_vectors.keys()
+    for vector_id, (namespace, vector) in target_vectors.items():
+        source_namespace, source_vector = source_vectors[vector_id]
+        assert source_namespace.endswith(namespace)
+        assert vector.metadata == source_vector.metadata
+        assert len(vector.values) == 32
+        assert np.isclose(np.linalg.norm(vector.values), 1.0)
@@ -0,0 +1,110 @@
+"""Request keying, record → replay round trips and failure modes of record_replay"""
+import sys
+
+import httpx
+import pytest
+
+import record_replay
+from record_replay import (Cassette, CassetteHookError, CassetteMissError, CassetteTransport, activate,
+                           deactivate, request_key)
+
+PINECONE_QUERY_URL = "https://index.svc.pinecone.io/query"
+PINECONE_UPSERT_URL = "https://index.svc.pinecone.io/vectors/upsert"
+
+
+@pytest.fixture
+def cassette_env(monkeypatch):
+    # activate() fills in placeholder keys for replay; keep them out of other tests
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("PINECONE_API_KEY", "test")
+    monkeypatch.setattr(record_replay, "_pinecone_hooked", False)
+    yield
+    deactivate()
+
+
+def test_request_key_normalizes_json_bodies():
+    url = "https://api.openai.com/v1/embeddings"
+    assert (request_key("openai", "post", url, b'{"model": "m", "input": ["a"]}')
+            == request_key("openai", "POST", url, b'{"input": ["a"], "model": "m"}'))
+    assert request_key("openai", "POST", url, b'{"input": ["a"]}') != request_key("openai", "POST", url,
+                                                                                   b'{"input": ["b"]}')
+    assert request_key("openai", "GET", url + "?limit=1") != request_key("openai", "GET", url + "?limit=2")
+    assert request_key("openai", "POST", url, b"") == request_key("openai", "POST", url, None)
+
+
+def test_request_key_ignores_random_pinecone_ids():
+    def upsert(ids, namespace="ns"):
+        return {"namespace": namespace, "vectors": [{"id": i, "values": [0.1]} for i in ids]}
+
+    assert (request_key("pinecone", "POST", PINECONE_UPSERT_URL, upsert(["a", "b"]))
+            == request_key("pinecone", "POST", PINECONE_UPSERT_URL, upsert(["c", "d"])))
+    assert (request_key("pinecone", "POST", PINECONE_UPSERT_URL, upsert(["a"]))
+            != request_key("pinecone", "POST", PINECONE_UPSERT_URL, upsert(["a", "b"])))
+    assert (request_key("pinecone", "POST", PINECONE_UPSERT_URL, upsert(["a"], "ns1"))
+            != request_key("pinecone", "POST", PINECONE_UPSERT_URL, upsert(["a"], "ns2")))
+    delete_url = "https://index.svc.pinecone.io/vectors/delete"
+    assert (request_key("pinecone", "POST", delete_url, {"ids": ["x"], "namespace": "ns"})
+            == request_key("pinecone", "POST", delete_url, {"ids": ["y"], "namespace": "ns"}))
+
+
+def _openai_client(cassette, live_calls):
+    def live(request):
+        live_calls.append(request.url)
+        return httpx.Response(200, json={"data": [len(live_calls)]}, headers={"x-ratelimit-remaining": "9"})
+    return httpx.Client(transport=CassetteTransport(cassette, wrapped=httpx.MockTransport(live)))
+
+
+def test_httpx_record_then_replay(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    live_calls = []
+    with _openai_client(Cassette(path, mode="record"), live_calls) as client:
+        recorded = client.post("https://api.openai.com/v1/embeddings", json={"input": ["a"]})
+    assert len(live_calls) == 1
+
+    replay = Cassette(path, mode="replay", latency="none")
+    assert len(replay) == 1
+    with _openai_client(replay, live_calls) as client:
+        replayed = client.post("https://api.openai.com/v1/embeddings", json={"input": ["a"]})
+    assert len(live_calls) == 1
+    assert replayed.json() == recorded.json()
+    assert replayed.headers["x-ratelimit-remaining"] == "9"
+    assert replay.stats["hits"] == 1
+
+
+def test_strict_replay_miss_raises(tmp_path):
+    cassette = Cassette(str(tmp_path / "empty.jsonl.gz"), mode="replay", strict=True)
+    with _openai_client(cassette, []) as client:
+        with pytest.raises(CassetteMissError):
+            client.post("https://api.openai.com/v1/embeddings", json={"input": ["never recorded"]})
+
+
+def test_pinecone_record_then_replay(tmp_path, monkeypatch, cassette_env):
+    from pinecone.openapi_support.rest_urllib3 import Urllib3RestClient
+    from pinecone.openapi_support.rest_utils import RESTResponse
+
+    live_calls = []
+
+    def live_request(self, method, url, query_params=None, headers=None, body=None,
+                     post_params=None, _preload_content=True, _request_timeout=None):
+        live_calls.append(url)
+        return RESTResponse(200, b'{"matches": [{"id": "a", "score": 0.9}]}', {"content-type": "application/json"})
+
+    monkeypatch.setattr(Urllib3RestClient, "request", live_request)
+    path = str(tmp_path / "cassette.jsonl.gz")
+
+    activate(path, mode="record")
+    recorded = Urllib3RestClient.request(None, "POST", PINECONE_QUERY_URL, body={"topK": 1, "vector": [0.1]})
+    assert len(live_calls) == 1
+
+    activate(path, mode="replay", latency="none", strict=True)
+    replayed = Urllib3RestClient.request(None, "POST", PINECONE_QUERY_URL, body={"vector": [0.1], "topK": 1})
+    assert len(live_calls) == 1
+    assert replayed.status == 200 and replayed.data == recorded.data
+
+
+def test_missing_pinecone_hook_target_fails_activation(tmp_path, monkeypatch, cassette_env):
+    # As if an SDK upgrade had moved the REST client
+    monkeypatch.setitem(sys.modules, "pinecone.openapi_support.rest_urllib3", None)
+    with pytest.raises(CassetteHookError, match="Urllib3RestClient.request"):
+        activate(str(tmp_path / "cassette.jsonl.gz"), mode="replay")
+    assert record_replay._active is None
@@ -0,0 +1,116 @@
+"""Corpus diffing, lock scope and the app → worker rebuild request handshake of refresh_worker"""
+import fcntl
+import json
+import os
+
+import refresh_worker
+from refresh_worker import RefreshWorker, diff_corpus, parse_interval, pending_request, request_rebuild, worker_running
+
+
+def test_diff_corpus():
+    old = [{"url": "a", "title": "A", "content": "x"}, {"url": "b", "title": "B", "content": "y"},
+           {"url": "c", "title": "C", "content": "z"}]
+    new = [{"url": "a", "title": "A", "content": "x"}, {"url": "b", "title": "B", "content": "y2"},
+           {"url": "d", "title": "D", "content": "w"}]
+    assert diff_corpus(old, new) == {"added": ["d"], "changed": ["b"], "removed": ["c"]}
+    assert diff_corpus(old, old) == {"added": [], "changed": [], "removed": []}
+
+
+def test_parse_interval():
+    assert parse_interval("90") == 90
+    assert parse_interval("30m") == 1800
+    assert parse_interval("6h") == 6 * 3600
+    assert parse_interval("1d") == 86400
+
+
+def test_rebuild_request_is_queued_once(tmp_path):
+    path = str(tmp_path / "request.json")
+    assert pending_request(path) is None
+    assert request_rebuild("first", path)
+    assert not request_rebuild("second", path)
+    assert pending_request(path)["reason"] == "first"
+
+
+def test_worker_running():
+    assert worker_running({"pid": os.getpid()})
+    assert not worker_running({})
+    assert not worker_running(None)
+
+
+def _lock_held(path):
+    # flock conflicts between open files even within one process
+    with open(path, "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(f, fcntl.LOCK_UN)
+        return False
+
+
+class _StubWorker(RefreshWorker):
+    """Worker with the crawl and index replaced, recording whether the ingestion lock was held"""
+
+    def __init__(self, tmp_path, articles, unfetched=()):
+        super().__init__(str(tmp_path / "corpus.json"), status_path=str(tmp_path / "status.json"),
+                         request_path=str(tmp_path / "request.json"))
+        self.articles = articles
+        self.unfetched = list(unfetched)
+        self.crawls = []
+        self.ingests = []
+
+    def crawl(self, resume=False):
+        self.crawls.append(_lock_held(refresh_worker.LOCK_PATH))
+        return self.articles, True, self.unfetched
+
+    def ingest(self, articles, changes):
+        self.ingests.append((_lock_held(refresh_worker.LOCK_PATH), changes))
+        self.ingested = articles
+        with open(self.data_path, "w") as f:
+            json.dump(articles, f)
+        os.remove(self.staged_path)
+        return "g1"
+
+    def warm_answers(self):
+        pass
+
+
+def _patch_locks(tmp_path, monkeypatch):
+    monkeypatch.setattr(refresh_worker, "LOCK_PATH", str(tmp_path / "refresh.lock"))
+    monkeypatch.setattr(refresh_worker, "CRAWL_LOCK_PATH", str(tmp_path / "crawl.lock"))
+
+
+def test_crawl_runs_outside_the_ingestion_lock(tmp_path, monkeypatch):
+    _patch_locks(tmp_path, monkeypatch)
+    worker = _StubWorker(tmp_path, [{"url": "a", "title": "A", "content": "x"}])
+    assert worker.run_once()["state"] == "idle"
+    assert worker.crawls == [False]
+    assert worker.ingests == [(True, {"added": ["a"], "changed": [], "removed": []})]
+
+
+def test_busy_ingestion_keeps_the_crawl_staged(tmp_path, monkeypatch):
+    _patch_locks(tmp_path, monkeypatch)
+    worker = _StubWorker(tmp_path, [{"url": "a", "title": "A", "content": "x"}])
+    with open(refresh_worker.LOCK_PATH, "w") as other_process:
+        fcntl.flock(other_process, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert worker.run_once()["state"] == "staged"
+    assert os.path.exists(worker.staged_path) and not worker.ingests
+
+    # The next cycle ingests what was staged without crawling again
+    assert worker.run_once()["state"] == "idle"
+    assert len(worker.crawls) == 1 and len(worker.ingests) == 1
+    assert not os.path.exists(worker.staged_path)
+
+
+def test_unfetched_pages_are_not_removals(tmp_path, monkeypatch):
+    _patch_locks(tmp_path, monkeypatch)
+    current = [{"url": f"https://x.com/{name}", "title": name, "content": "x"} for name in ("a", "b", "c")]
+    (tmp_path / "corpus.json").write_text(json.dumps(current))
+    # b changed, c could not be fetched and was given up on
+    crawled = [current[0], dict(current[1], content="y")]
+    worker = _StubWorker(tmp_path, crawled, unfetched=["https://x.com/c/"])
+
+    assert worker.run_once()["state"] == "idle"
+    assert worker.ingests[0][1] == {"added": [], "changed": ["https://x.com/b"], "removed": []}
+    assert [article["url"] for article in worker.ingested] == ["https://x.com/a", "https://x.com/b", "https://x.com/c"]
+    assert len(json.loads((tmp_path / "corpus.json").read_text())) == 3
@@ -0,0 +1,27 @@
+"""Profiling gates and output files of request_profiler"""
+from request_profiler import RequestProfiler, profiling_allowed, profiling_requested
+
+
+def test_profiling_needs_the_operator_setting(monkeypatch):
+    monkeypatch.delenv("PROFILE_REQUESTS", raising=False)
+    assert not profiling_allowed()
+    assert not profiling_requested("1")
+
+    monkeypatch.setenv("PROFILE_REQUESTS", "allow")
+    assert profiling_allowed()
+    assert profiling_requested("1")
+    assert not profiling_requested(None)
+
+    monkeypatch.setenv("PROFILE_REQUESTS", "1")
+    assert profiling_requested(None)
+    assert not profiling_requested("0")
+
+
+def test_profiles_in_the_same_second_do_not_collide(tmp_path):
+    paths = set()
+    for _ in range(2):
+        with RequestProfiler("Same question", output_dir=str(tmp_path), memory=False) as profiler:
+            sum(range(1000))
+        paths.add(profiler.paths["summary"])
+    assert len(paths) == 2
+    assert len(list(tmp_path.glob("*.json"))) == 2
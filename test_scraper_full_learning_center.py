@@ -0,0 +1,36 @@
+"""Retry classification of fetch_page in scraper_full_learning_center"""
+import pytest
+import requests
+
+import scraper_full_learning_center as scraper
+
+
+def _respond(monkeypatch, status_code, calls=None):
+    def get(url, headers=None, timeout=None):
+        if calls is not None:
+            calls.append(timeout)
+        response = requests.Response()
+        response.status_code = status_code
+        response.url = url
+        response._content = b"<html><h1>Article</h1></html>"
+        return response
+    monkeypatch.setattr(scraper.requests, "get", get)
+
+
+@pytest.mark.parametrize("status_code", [403, 429, 500, 503])
+def test_retryable_responses_raise(monkeypatch, status_code):
+    _respond(monkeypatch, status_code)
+    with pytest.raises(requests.HTTPError):
+        scraper.fetch_page("https://example.com/a", scraper.HEADERS)
+
+
+def test_missing_page_is_not_retried(monkeypatch):
+    _respond(monkeypatch, 404)
+    assert scraper.fetch_page("https://example.com/a", scraper.HEADERS) is None
+
+
+def test_fetch_page_sets_a_timeout(monkeypatch):
+    calls = []
+    _respond(monkeypatch, 200, calls)
+    assert scraper.fetch_page("https://example.com/a", scraper.HEADERS).h1.get_text() == "Article"
+    assert calls == [scraper.REQUEST_TIMEOUT]
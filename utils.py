@@ -1,6 +1,39 @@
 import openai
 import os
+from contextlib import nullcontext
 from openai import OpenAI  # Import the OpenAI class
+from record_replay import openai_http_client
+
+# The questions suggested in the app's "Try asking me about these topics" expander
+EXAMPLE_QUESTIONS = [
+    ("🏠", "How do I buy my first house?"),
+    ("🎓", "What's the best way to save for college?"),
+    ("💳", "How do I manage credit card debt?"),
+    ("📈", "Should I invest in cryptocurrency?"),
+    ("🏦", "What are ETFs and how do they work?"),
+    ("👴", "How much should I save for retirement?"),
+]
+
+ERROR_RESPONSE_PREFIX = "I apologize, but I encountered an error while generating a response"
+
+_token_encoder = None
+
+def count_tokens(text):
+    """
+    Count tokens with the cl100k_base encoding used by text-embedding-3-small
+    and gpt-3.5-turbo. Falls back to a ~4 characters per token estimate when
+    tiktoken's encoding file can't be loaded (e.g. offline).
+    """
+    global _token_encoder
+    if _token_encoder is None:
+        try:
+            import tiktoken
+            _token_encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _token_encoder = False
+    if _token_encoder:
+        return len(_token_encoder.encode(text))
+    return max(1, (len(text) + 3) // 4)
 
 def build_prompt(user_question, retrieved_chunks):
     prompt = "You are a helpful financial assistant designed to answer questions about investing, finance, and money management using information from Fidelity Learning Center.\n\n"
@@ -56,9 +89,10 @@ def format_response_with_references(response_text, retrieved_metadatas):
     
     return formatted_response
 
-def get_openai_response(prompt, retrieved_metadatas):
+def get_openai_response(prompt, retrieved_metadatas, client=None):
     openai.api_key = os.environ.get("OPENAI_API_KEY")
-    client = OpenAI()  # Create an instance of the OpenAI client
+    if client is None:
+        client = OpenAI(http_client=openai_http_client())  # Create an instance of the OpenAI client
     
     try:
         response = client.chat.completions.create(
@@ -71,4 +105,77 @@ def get_openai_response(prompt, retrieved_metadatas):
         formatted_response = format_response_with_references(response_text, retrieved_metadatas)
         return formatted_response
     except Exception as e:
-        return f"I apologize, but I encountered an error while generating a response: {str(e)}"
\ No newline at end of file
+        return f"{ERROR_RESPONSE_PREFIX}: {str(e)}"
+
+_default_compressor = None
+
+def default_compressor():
+    """
+    Context compressor configured by CONTEXT_COMPRESSION_RATIO (share of the
+    retrieved tokens to keep, "off" to disable) and CONTEXT_TOKEN_BUDGET;
+    CONTEXT_COMPRESSION_VERBOSE=1 logs every compression. Returns None when
+    compression is disabled.
+    """
+    global _default_compressor
+    if _default_compressor is None:
+        from context_compression import DEFAULT_RATIO, ContextCompressor
+        ratio = os.getenv("CONTEXT_COMPRESSION_RATIO", str(DEFAULT_RATIO)).strip().lower()
+        budget = os.getenv("CONTEXT_TOKEN_BUDGET")
+        if ratio in ("off", "0", "1", "none", ""):
+            _default_compressor = False
+        else:
+            verbose = os.getenv("CONTEXT_COMPRESSION_VERBOSE", "").strip().lower() in ("1", "true", "yes", "on")
+            _default_compressor = ContextCompressor(ratio=float(ratio), token_budget=int(budget) if budget else None,
+                                                    verbose=verbose)
+    return _default_compressor or None
+
+def _no_stage(name):
+    return nullcontext()
+
+def answer_question(data_handler, question, stage=None, completion_client=None, compressor=None,
+                    answer_store=None, trace=None):
+    """
+    Run one chat turn the way app.py does: serve a precomputed answer if
+    answer_store has one, otherwise retrieve context from Pinecone, compress
+    it to the sentences relevant to the question, build the prompt and
+    generate a referenced answer.
+
+    stage(name) is entered around each step ("answer_store", "retrieve",
+    "compress", "build_prompt", "completion") so callers can attach spinners,
+    timers or profilers. compressor defaults to default_compressor(). If
+    trace is a dict, it is filled with the retrieved chunks and metadata.
+    """
+    stage = stage or _no_stage
+    
+    if answer_store is not None:
+        with stage("answer_store"):
+            precomputed = answer_store.lookup(question)
+        if precomputed is not None:
+            return precomputed
+    
+    compressor = compressor or default_compressor()
+    
+    with stage("retrieve"):
+        results = data_handler.query_pinecone(question)
+        if results["documents"] and results["metadatas"]:
+            retrieved_chunks = results["documents"][0]
+            retrieved_metadatas = results["metadatas"][0]
+        else:
+            retrieved_chunks = []
+            retrieved_metadatas = []
+    if trace is not None:
+        trace.update(documents=list(retrieved_chunks), metadatas=list(retrieved_metadatas))
+    
+    if compressor is not None:
+        with stage("compress"):
+            retrieved_chunks, retrieved_metadatas, _ = compressor.compress(
+                question, retrieved_chunks, retrieved_metadatas
+            )
+    
+    with stage("build_prompt"):
+        full_prompt = build_prompt(question, retrieved_chunks)
+    
+    with stage("completion"):
+        response = get_openai_response(full_prompt, retrieved_metadatas, client=completion_client)
+    
+    return response
\ No newline at end of file